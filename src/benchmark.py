@@ -0,0 +1,348 @@
+"""
+GitHub Actions Version Updater Benchmark.
+
+This script measures the performance of the updater without touching the real GitHub API. It starts a local
+stand-in for api.github.com, generates a synthetic tree of workflow files, and then times update_all_actions end
+to end as well as each of its phases (discovery, scan, resolve and write) separately. Because both the API and the
+input are synthetic the results are reproducible, which makes it a simple way to catch performance regressions.
+
+Features:
+    - Local fake GitHub API serving paginated tag lists, ETags / 304 responses, the GraphQL endpoint and 403 rate limit responses.
+    - Configurable number of files, distinct actions, tags per action and simulated network latency.
+    - Per-phase and end-to-end timings over several repetitions, optionally written to a JSON file for comparison.
+
+Usage:
+    Run the script from the command line, for example:
+
+        python src/benchmark.py --files 1000 --actions 150 --latency 0.05 --repeat 3
+
+    See '--help' for a full list of options.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from tabulate import tabulate
+
+import update
+
+BENCHMARK_TOKEN = "benchmark-token"  # The fake API accepts any token, one is needed for the GraphQL resolver
+FILLER_LINE = "        run: echo \"synthetic workflow step\"\n"
+
+
+class FakeGitHubServer(ThreadingHTTPServer):  # pylint: disable=too-many-instance-attributes
+    """A threaded HTTP server that imitates the parts of the GitHub API used by the updater."""
+
+    daemon_threads = True
+
+    def __init__(self, tag_count: int, latency: float, rate_limit: Optional[int], rate_limit_window: float = 60.0) -> None:
+        """
+        Start listening on a free local port.
+
+        Arguments:
+            tag_count (int): The number of tags every repository has.
+            latency (float): Seconds to wait before answering each request.
+            rate_limit (Optional[int]): The number of requests served in each window before answering with 403 rate limit errors,
+                or None for no limit.
+            rate_limit_window (float): Seconds after which the rate limit budget is reset.
+        """
+        super().__init__(("127.0.0.1", 0), FakeGitHubHandler)
+        self.tag_count: int = tag_count
+        self.latency: float = latency
+        self.rate_limit: Optional[int] = rate_limit
+        self.rate_limit_window: float = rate_limit_window
+        self.rate_limit_reset: float = time.time() + rate_limit_window
+        self.window_count: int = 0
+        self.request_count: int = 0
+        self.request_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Return the base URL of the fake API."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count_request(self) -> int:
+        """
+        Record a request.
+
+        Returns:
+            int: The number of requests served in the current rate limit window, including this one.
+        """
+        with self.request_lock:
+            if time.time() >= self.rate_limit_reset:
+                self.rate_limit_reset = time.time() + self.rate_limit_window
+                self.window_count = 0
+            self.request_count += 1
+            self.window_count += 1
+            return self.window_count
+
+    def get_tags(self, owner: str, repo: str) -> List[Dict[str, Any]]:
+        """
+        Build the tag list of a repository, in the name order the real tags endpoint uses rather than version order.
+
+        Arguments:
+            owner (str): The owner of the repository.
+            repo (str): The name of the repository.
+
+        Returns:
+            List[Dict[str, Any]]: The tags, in the format of the REST tags endpoint.
+        """
+        names: List[str] = sorted((f"v{i // 25}.{(i // 5) % 5}.{i % 5}" for i in range(self.tag_count)), reverse=True)
+        return [{"name": name, "commit": {"sha": hashlib.sha1(f"{owner}/{repo}@{name}".encode(), usedforsecurity=False).hexdigest()}} for name in names]
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Request handler for FakeGitHubServer."""
+
+    server: FakeGitHubServer
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        """Silence the default per-request logging."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve a page of the tags endpoint."""
+        if not self.begin_request():
+            return
+
+        parsed = urlparse(self.path)
+        parts: List[str] = parsed.path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] != "repos" or parts[3] != "tags":
+            self.send_json(404, {"message": "Not Found"})
+            return
+
+        owner, repo = parts[1], parts[2]
+        etag: str = f'"{owner}-{repo}-{self.server.tag_count}"'
+        query: Dict[str, List[str]] = parse_qs(parsed.query)
+        per_page: int = int(query.get("per_page", ["30"])[0])
+        page: int = int(query.get("page", ["1"])[0])
+
+        if page == 1 and self.headers.get("If-None-Match") == etag:
+            self.send_json(304, None, {"ETag": etag})
+            return
+
+        tags: List[Dict[str, Any]] = self.server.get_tags(owner, repo)
+        headers: Dict[str, str] = {"ETag": etag} if page == 1 else {}
+        if page * per_page < len(tags):
+            headers["Link"] = f'<{self.server.url}/repos/{owner}/{repo}/tags?per_page={per_page}&page={page + 1}>; rel="next"'
+        self.send_json(200, tags[(page - 1) * per_page:page * per_page], headers)
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Serve a batched GraphQL tags query."""
+        if not self.begin_request():
+            return
+
+        request: Dict[str, Any] = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        variables: Dict[str, str] = request.get("variables", {})
+        data: Dict[str, Any] = {}
+        index: int = 0
+
+        while f"owner{index}" in variables:
+            tags: List[Dict[str, Any]] = self.server.get_tags(variables[f"owner{index}"], variables[f"name{index}"])
+            nodes: List[Dict[str, Any]] = [{"name": tag["name"], "target": {"oid": tag["commit"]["sha"]}} for tag in tags[:update.TAGS_PER_PAGE]]
+            data[f"r{index}"] = {"refs": {"nodes": nodes}}
+            index += 1
+
+        self.send_json(200, {"data": data})
+
+    def begin_request(self) -> bool:
+        """
+        Apply the simulated latency and rate limit to an incoming request.
+
+        Returns:
+            bool: True if the request should be served, False if a rate limit response was sent.
+        """
+        count: int = self.server.count_request()
+        time.sleep(self.server.latency)
+
+        if self.server.rate_limit is not None and count > self.server.rate_limit:
+            self.send_json(403, {"message": "API rate limit exceeded"}, {"X-RateLimit-Remaining": "0"})
+            return False
+        return True
+
+    def send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Send a JSON response.
+
+        Arguments:
+            status (int): The HTTP status code.
+            body (Any): The value to encode as the response body, or None for an empty body.
+            headers (Optional[Dict[str, str]]): Extra response headers.
+        """
+        payload: bytes = json.dumps(body).encode() if body is not None else b""
+        all_headers: Dict[str, str] = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(payload)),
+            "X-RateLimit-Remaining": str(max(0, (self.server.rate_limit or 5000) - self.server.window_count)),
+            "X-RateLimit-Reset": str(int(self.server.rate_limit_reset)),
+        }
+        all_headers.update(headers or {})
+
+        self.send_response(status)
+        for name, value in all_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main() -> None:
+    """Parse command-line arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the GitHub Actions updater against a local fake GitHub API.")
+    parser.add_argument("--files", type=int, default=500, help="Number of workflow files to generate. Default is 500.")
+    parser.add_argument("--actions", type=int, default=100, help="Number of distinct actions referenced across the files. Default is 100.")
+    parser.add_argument("--refs-per-file", type=int, default=10, help="Number of action references in each file. Default is 10.")
+    parser.add_argument("--filler-lines", type=int, default=200, help="Number of lines without actions in each file. Default is 200.")
+    parser.add_argument("--tags", type=int, default=150, help="Number of tags each action has. Default is 150.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of simulated latency per API request. Default is 0.05.")
+    parser.add_argument("--rate-limit", type=int, help="Number of API requests served per window before the fake API answers with 403 rate limit errors.")
+    parser.add_argument("--rate-limit-window", type=float, default=60.0, help="Seconds after which the fake API resets its rate limit. Default is 60.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of times each measurement is repeated. Default is 3.")
+    parser.add_argument("--max-workers", type=int, default=update.DEFAULT_MAX_WORKERS, help="Passed to the updater.")
+    parser.add_argument("--jobs", type=int, default=1, help="Passed to the updater.")
+    parser.add_argument("--resolver", choices=update.RESOLVERS, default="rest", help="Passed to the updater.")
+    parser.add_argument("--engine", choices=update.ENGINES, default="threads", help="Passed to the updater.")
+    parser.add_argument("--cache", action="store_true", help="Use a temporary persistent cache, so repeated runs measure cache revalidation.")
+    parser.add_argument("--cache-ttl", type=int, default=0, help="TTL of the temporary persistent cache. Default is 0, always revalidate.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    args: argparse.Namespace = parser.parse_args()
+
+    server: FakeGitHubServer = FakeGitHubServer(args.tags, args.latency, args.rate_limit, args.rate_limit_window)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    update.set_api_url(server.url)
+
+    work_dir: str = tempfile.mkdtemp(prefix="update-actions-benchmark-")
+    if args.cache:
+        update.open_persistent_cache(os.path.join(work_dir, "cache.sqlite3"), args.cache_ttl, update.DEFAULT_CACHE_MAX_ENTRIES, False)
+
+    try:
+        results: Dict[str, List[float]] = run_benchmark(server, work_dir, args)
+    finally:
+        update.close_persistent_cache()
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"parameters": vars(args), "results": results}, file, indent=2)
+
+
+def generate_workflow_tree(root: str, files: int, actions: int, refs_per_file: int, filler_lines: int) -> None:
+    """
+    Generate a tree of synthetic workflow files that reference pinned actions.
+
+    Every reference is pinned to an old version so that all of them are updated, which exercises the write path.
+
+    Arguments:
+        root (str): The directory to generate the files in.
+        files (int): The number of workflow files.
+        actions (int): The number of distinct actions referenced across the files.
+        refs_per_file (int): The number of action references in each file.
+        filler_lines (int): The number of lines without actions in each file.
+    """
+    for index in range(files):
+        directory: str = os.path.join(root, f"project{index % 10}", ".github", "workflows")
+        os.makedirs(directory, exist_ok=True)
+
+        lines: List[str] = ["name: Synthetic\n", "on: push\n", "jobs:\n", "  build:\n", "    steps:\n"]
+        for ref in range(refs_per_file):
+            action: int = (index * refs_per_file + ref) % max(1, actions)
+            lines.append(f"      - uses: benchmark-org{action % 10}/action-{action}@{'0' * 40}  # v0.0.1\n")
+            lines.extend([FILLER_LINE] * (filler_lines // max(1, refs_per_file)))
+
+        with open(os.path.join(directory, f"workflow{index}.yml"), "w", encoding="utf-8") as file:
+            file.writelines(lines)
+
+
+def reset_update_state() -> None:
+    """Clear the updater's in-memory state, so that every run starts cold apart from the persistent cache."""
+    update.version_cache.clear()
+    update.failure_cache.clear()
+    update.version_indexes.clear()
+    update.rate_limit_exceeded = False
+
+
+def time_call(function: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, float]:
+    """
+    Call a function and measure how long it takes.
+
+    Arguments:
+        function (Callable[..., Any]): The function to call.
+        *args (Any): Positional arguments for the function.
+        **kwargs (Any): Keyword arguments for the function.
+
+    Returns:
+        Tuple[Any, float]: The function's return value and the elapsed wall-clock time in seconds.
+    """
+    start: float = time.perf_counter()
+    result: Any = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(server: FakeGitHubServer, work_dir: str, args: argparse.Namespace) -> Dict[str, List[float]]:
+    """
+    Time each phase and the end-to-end update, on a freshly generated tree every time.
+
+    Arguments:
+        server (FakeGitHubServer): The fake API, used to count requests.
+        work_dir (str): A scratch directory for the generated trees.
+        args (argparse.Namespace): The benchmark options.
+
+    Returns:
+        Dict[str, List[float]]: The measurements of every repetition, keyed by measurement name.
+    """
+    results: Dict[str, List[float]] = {"discover": [], "scan": [], "resolve": [], "write": [], "end to end": [], "api requests": []}
+
+    for run in range(args.repeat):
+        root: str = os.path.join(work_dir, f"phases{run}")
+        generate_workflow_tree(root, args.files, args.actions, args.refs_per_file, args.filler_lines)
+        reset_update_state()
+        requests_before: int = server.request_count
+
+        file_paths, elapsed = time_call(update.find_action_files, root, [".yml"], True)
+        results["discover"].append(elapsed)
+        references, elapsed = time_call(update.collect_action_references, file_paths, args.jobs)
+        results["scan"].append(elapsed)
+        resolved, elapsed = time_call(update.resolve_actions, references, BENCHMARK_TOKEN, False, args.max_workers, None, args.resolver, args.engine)
+        results["resolve"].append(elapsed)
+        _, elapsed = time_call(update.rewrite_action_files, file_paths, resolved, BENCHMARK_TOKEN, False, False, False, args.jobs)
+        results["write"].append(elapsed)
+        results["api requests"].append(server.request_count - requests_before)
+
+        root = os.path.join(work_dir, f"end-to-end{run}")
+        generate_workflow_tree(root, args.files, args.actions, args.refs_per_file, args.filler_lines)
+        reset_update_state()
+        _, elapsed = time_call(update.update_all_actions, root, BENCHMARK_TOKEN, False, False, [".yml"], True, False,
+                               args.max_workers, None, args.resolver, args.engine, args.jobs)
+        results["end to end"].append(elapsed)
+
+    return results
+
+
+def print_results(results: Dict[str, List[float]], repeat: int) -> None:
+    """
+    Print a table of the minimum, mean and maximum of every measurement.
+
+    Arguments:
+        results (Dict[str, List[float]]): The measurements of every repetition, keyed by measurement name.
+        repeat (int): The number of repetitions.
+    """
+    print(f"\nBenchmark Results ({repeat} runs)")
+    print(tabulate([
+        [name, min(values), statistics.mean(values), max(values)] for name, values in results.items() if values
+    ], headers=["Measurement", "Min", "Mean", "Max"], tablefmt="grid", floatfmt=".4f"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+# pylint: disable=too-many-lines  # The updater is distributed as a single self-contained script
 """
 GitHub Actions Version Updater.
 
@@ -8,18 +9,40 @@ It supports optional features such as creating backups of modified files, runnin
 mode to preview changes, and recursively scanning subdirectories.
 
 Features:
-    - Checks for the latest version of GitHub Actions by querying the GitHub API.
+    - Checks for the latest version of GitHub Actions by querying the GitHub API, picking the highest stable semantic version.
+    - Scans all files first and resolves each unique action once, using a bounded pool of concurrent lookups.
+    - Persists resolved versions between runs in an SQLite cache with a TTL and least-recently-used eviction.
+    - Revalidates expired cache entries with conditional (ETag / Last-Modified) requests.
+    - Reuses a pool of keep-alive connections to the GitHub API for all lookups in a run.
+    - Optionally resolves many actions per request through the GitHub GraphQL API.
+    - Optionally scans and rewrites files across a pool of worker processes.
+    - Scans each file with a single pass over its whole contents, leaving unchanged files untouched.
+    - Memory maps very large files and only reads them if they contain an action reference.
+    - Optionally keeps a fingerprint index of scanned files, so unchanged files are neither scanned nor rewritten on later runs.
+    - Optional asyncio lookup engine (async_resolve_actions) for embedding in event-loop based applications.
     - Updates action references within files if a newer version is available.
     - Supports dry-run mode to preview changes without modifying files.
     - Creates backups of updated files in a 'backups' directory at the same level as the original file.
     - Allows specifying custom file extensions and optional recursive scanning of subdirectories.
-    - Rate limit handling for GitHub API requests, including automatic wait times when limits are exceeded.
+    - Updates many repositories in one run, resolving each action once for all of them and summarising each repository.
+    - Splits a fleet into deterministic shards for several runners, with a 'merge' command to combine their results.
+    - Runs offline from a snapshot of action tags built with the 'snapshot build' command.
+    - Resolves actions from local bare git mirrors, reading packed and loose refs directly instead of calling the API.
+    - Optionally limits discovery to files tracked by git, never walking ignored directories such as node_modules.
+    - Prunes directories matching exclude patterns before walking them, and can restrict the scan to .github/workflows.
+    - Rate limit handling for GitHub API requests, pacing requests from the budget reported on every response and honouring Retry-After.
+    - Looks up the actions referenced by the most files first.
+    - Remembers actions that are missing, private or have no version tags, so they are looked up once rather than per reference.
+    - Rotates requests through a pool of GitHub tokens, retiring exhausted tokens until their reset.
+    - Optional shared cache server ('serve-cache') so a fleet of CI jobs looks each action up on GitHub only once.
+    - Retries failed requests with exponential backoff and jitter, within an optional deadline for the whole run.
     - Detailed logging options for verbose output.
 
 Dependencies:
     - requests: For making HTTP requests to the GitHub API.
     - packaging.version: For reliable version comparison of GitHub Actions tags.
     - tabulate: For formatted console output of summary statistics.
+    - aiohttp (optional): For the asyncio lookup engine.
 
 Usage:
     Run the script from the command line and specify the folder path to scan, as well as any
@@ -30,380 +53,3588 @@ Usage:
     See '--help' for a full list of options.
 
 Arguments:
-    - --path (str): Path to the folder containing GitHub Actions files (default is current directory).
+    - --path (str): Path to the folder containing GitHub Actions files, may be repeated (default is current directory).
+    - --manifest (str): File listing folders to update, one per line.
+    - --shard (str): Only update the folders in shard 'i/N' of the fleet.
+    - --results-json (str): Write the statistics of each folder to a JSON file, combined later with 'update.py merge'.
     - --github-token (str): GitHub personal access token to increase API rate limits.
+    - --github-tokens-file (str): File with one GitHub token per line; requests rotate through them and any in $GITHUB_TOKENS.
+    - --cache-url (str): Base URL of a shared cache server started with 'serve-cache', used instead of the GitHub API.
+    - --api-url (str): Base URL of the GitHub API (default is https://api.github.com).
     - --dry-run (bool): If specified, prints changes without modifying files.
     - --backup (bool): If specified, creates a backup of each file before updating.
     - --extensions (str): Comma-separated list of file extensions to check (default is 'yml,yaml').
     - --recursive (bool): If specified, recursively searches subdirectories.
+    - --discovery (str): How files are found, 'walk' (all files) or 'git' (only files tracked by git) (default is 'walk').
+    - --exclude (str): Comma-separated glob patterns of files and directories to skip ('backups' directories are always skipped).
+    - --include (str): Comma-separated glob patterns; if given, only matching files are checked.
+    - --workflows-only (bool): If specified, only checks files in the .github/workflows directory.
     - --verbose (bool): If specified, prints detailed information about the update process.
+    - --max-workers (int): Maximum number of concurrent GitHub API lookups (default is 8).
+    - --jobs (int): Number of worker processes used to scan and rewrite files (default is 1).
+    - --scan-mode (str): How files are scanned, 'buffer' or 'lines' (default is 'buffer').
+    - --mmap-threshold (int): Size in bytes from which files are memory mapped before being read; 0 disables it (default is 4 MiB).
+    - --resolver (str): API used to look up versions, 'rest' or 'graphql' (default is 'rest').
+    - --engine (str): How REST lookups run concurrently, 'threads' or 'asyncio' (default is 'threads').
+    - --pool-size (int): Number of keep-alive connections kept open to the GitHub API (default is 8).
+    - --http-retries (int): Number of times a request failing with a connection error, timeout, 5xx or rate limit is retried (default is 2).
+    - --retry-backoff (float): Seconds before the first retry, doubled on every further retry and randomised (default is 0.5).
+    - --request-timeout (float): Seconds before a single API request times out (default is 10).
+    - --deadline (float): Seconds after which no more API requests are sent or retried (default is no deadline).
+    - --cache-file (str): Path to the persistent version cache (default is under the XDG cache directory).
+    - --cache-ttl (int): Seconds before a cached version is revalidated (default is 86400).
+    - --cache-max-entries (int): Maximum number of actions kept in the persistent cache (default is 5000).
+    - --negative-cache-ttl (int): Seconds before an action that could not be resolved is looked up again (default is 3600).
+    - --no-cache (bool): If specified, disables the persistent version cache.
+    - --snapshot (str): Snapshot file written by 'snapshot build', used to resolve actions before the GitHub API.
+    - --offline (bool): If specified, sends no API requests and resolves actions only from the snapshot and the cache.
+    - --mirror-root (str): Directory of bare git mirrors laid out as <owner>/<repo>.git, used instead of the API for the actions they hold.
+    - --incremental (bool): If specified, files unchanged since the last run are served from a fingerprint index in the cache.
 """
 
 import os
 import re
 import shutil
 import argparse
+import asyncio
+import fnmatch
+import hashlib
+import json
+import mmap
+import random
 import time
+import sqlite3
+import subprocess  # nosec B404
 import sys
+import threading
+import zlib
 
-from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
 
 import requests
 
+from requests.adapters import HTTPAdapter
+
 from packaging import version  # For version comparison
 from tabulate import tabulate
 
-# Constants
-GITHUB_TAGS_API_URL = "https://api.github.com/repos/{owner}/{repo}/tags"
+try:
+    import aiohttp  # Optional, only needed for the asyncio engine
+except ImportError:
+    aiohttp = None
+
+# Constants
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_TAGS_API_URL = GITHUB_API_URL + "/repos/{owner}/{repo}/tags"
+GITHUB_GRAPHQL_API_URL = GITHUB_API_URL + "/graphql"
+TAGS_PER_PAGE = 100  # The maximum page size the tags endpoint allows
+MAX_TAG_PAGES = 10  # Upper bound on pages fetched per repository
+GRAPHQL_BATCH_SIZE = 50  # Repositories resolved per GraphQL query
+RESOLVERS = ("rest", "graphql")
+ENGINES = ("threads", "asyncio")
+ACTION_REFERENCE_PREFILTER = 'uses:'  # Every line the pattern can match contains this, checked before running the regex
+# Whitespace is limited to spaces and tabs so that the pattern never matches across lines when scanning a whole file
+ACTION_REFERENCE_PATTERN = re.compile(r'uses:[ \t]+(?P<owner>[\w-]+)/(?P<repo>[\w-]+)@(?P<sha>[a-f0-9]+)[ \t]+(?P<comment>#[ \t]*v?(?P<version>[\d.]+))')
+# The same pattern over bytes, used to search memory-mapped files without decoding them
+ACTION_REFERENCE_BYTES_PATTERN = re.compile(ACTION_REFERENCE_PATTERN.pattern.encode('ascii'))
+SCAN_MODES = ("buffer", "lines")
+DISCOVERY_MODES = ("walk", "git")
+BACKUP_DIRECTORY = "backups"  # Created next to updated files, and never scanned
+WORKFLOWS_DIRECTORY = os.path.join(".github", "workflows")
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_POOL_SIZE = DEFAULT_MAX_WORKERS
+DEFAULT_HTTP_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5  # Seconds, doubled on every retry
+MAX_RETRY_BACKOFF = 30.0
+DEFAULT_REQUEST_TIMEOUT = 10.0
+DEFAULT_CACHE_TTL = 24 * 60 * 60  # Seconds before a persisted version is considered stale
+DEFAULT_CACHE_MAX_ENTRIES = 5000
+DEFAULT_NEGATIVE_CACHE_TTL = 60 * 60  # Seconds before a failed lookup is tried again
+NEGATIVE_STATUS_CODES = (404, 410, 451)  # Responses meaning the repository is missing, private or blocked, rather than a transient error
+DEFAULT_MMAP_THRESHOLD = 4 * 1024 * 1024  # Files of at least this many bytes are memory mapped and searched before being read
+CACHE_SCHEMA_VERSION = 5
+FILE_INDEX_MAX_AGE = 30 * 24 * 60 * 60  # Seconds a file that is no longer scanned is kept in the file index
+FILE_INDEX_QUERY_SIZE = 500  # Paths looked up per query, below SQLite's limit on bound parameters
+DEFAULT_CACHE_SERVER_PORT = 8787
+# Owner and repository names are limited to the characters ACTION_REFERENCE_PATTERN accepts, so '.' and '..' never reach a URL or path
+ACTION_NAME_PATTERN = re.compile(r'[\w-]+')
+CACHE_SERVER_PATH_PATTERN = re.compile(r'/v1/actions/(?P<owner>[\w-]+)/(?P<repo>[\w-]+)')
+MAX_TAG_PEEL_DEPTH = 8  # Annotated tags pointing at other tags are followed this many levels
+
+# Global cache and rate-limiting flag
+version_cache: Dict[Tuple[str, str], Tuple[str, str]] = {}
+failure_cache: Dict[Tuple[str, str], str] = {}  # Why the lookup of an action failed, so it is not repeated
+version_indexes: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}  # All stable tags of each action resolved in this run, newest first
+
+# Snapshot of action tags loaded with --snapshot, and whether lookups must be served without network access
+snapshot_index: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+offline_mode: bool = False
+
+# Directory of bare git mirrors, laid out as <owner>/<repo>.git, that replace API lookups for the actions they hold
+mirror_root: Optional[str] = None
+
+# Base URL of a shared cache server (serve-cache) that resolves actions on behalf of every run pointed at it
+cache_url: Optional[str] = None
+cache_url_lock = threading.Lock()
+rate_limit_exceeded = False  # Flag to stop further requests if API rate limit is hit
+
+# Rate limit budget of each (token, API resource) reported by the most recent API responses, used to pace requests before the limit is reached
+rate_limit_remaining: Dict[Tuple[Optional[str], str], int] = {}
+rate_limit_reset: Dict[Tuple[Optional[str], str], float] = {}
+rate_limit_next_slot: Dict[Tuple[Optional[str], str], float] = {}
+rate_limit_retry_at: float = 0.0  # No request may start before this time, set from Retry-After
+rate_limit_demand: int = 0  # Requests the current resolve still expects to send
+rate_limit_lock = threading.Lock()
+
+# Retry policy applied to every API request, set from the command line
+http_retries: int = DEFAULT_HTTP_RETRIES
+retry_backoff: float = DEFAULT_RETRY_BACKOFF
+request_timeout: float = DEFAULT_REQUEST_TIMEOUT
+run_deadline: Optional[float] = None  # No request is sent or retried after this time
+
+# Pool of tokens that requests rotate through; when empty the token given by the caller is used
+github_tokens: List[str] = []
+github_token_turn: int = 0
+
+# Persistent on-disk cache, shared by all lookups once opened
+persistent_cache: Optional[sqlite3.Connection] = None
+persistent_cache_ttl: int = DEFAULT_CACHE_TTL
+persistent_cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES
+persistent_cache_negative_ttl: int = DEFAULT_NEGATIVE_CACHE_TTL
+persistent_cache_lock = threading.Lock()
+
+# In-flight lookups, so concurrent callers for the same action share a single request
+inflight_requests: Dict[Tuple[str, str], Future] = {}
+inflight_requests_lock = threading.Lock()
+async_inflight_requests: Dict[Tuple[str, str], asyncio.Task] = {}
+
+# Shared HTTP session used when a caller does not supply its own
+http_session: Optional[requests.Session] = None
+http_session_lock = threading.Lock()
+
+
+def main() -> None:
+    """Parse command-line arguments and initiates the action updating process."""
+    subcommands: Dict[str, Callable[[List[str]], None]] = {"merge": merge_main, "snapshot": snapshot_main, "serve-cache": serve_cache_main}
+    if len(sys.argv) > 1 and sys.argv[1] in subcommands:
+        subcommands[sys.argv[1]](sys.argv[2:])
+        return
+
+    args: argparse.Namespace = build_argument_parser().parse_args()
+    extensions, excludes, includes = get_file_filters(args)
+
+    folder_paths: List[str] = get_folder_paths(args.path, args.manifest, args.shard, args.verbose)
+
+    github_token: Optional[str] = configure_api(args)
+
+    if not args.no_cache:
+        open_persistent_cache(args.cache_file, args.cache_ttl, args.cache_max_entries, args.verbose, args.negative_cache_ttl)
+
+    session: requests.Session = create_http_session(args.pool_size)
+
+    try:
+        root_stats: Dict[str, Dict[str, int]] = update_all_actions(
+            folder_path=folder_paths,
+            github_token=github_token,
+            dry_run=args.dry_run,
+            backup=args.backup,
+            extensions=extensions,
+            recursive=args.recursive,
+            verbose=args.verbose,
+            max_workers=args.max_workers,
+            session=session,
+            resolver=args.resolver,
+            engine=args.engine,
+            jobs=args.jobs,
+            scan_mode=args.scan_mode,
+            mmap_threshold=args.mmap_threshold,
+            incremental=args.incremental,
+            discovery=args.discovery,
+            excludes=excludes,
+            includes=includes,
+            workflows_only=args.workflows_only
+        )
+        if args.results_json:
+            write_results(args.results_json, root_stats, args.shard)
+    finally:
+        session.close()
+        close_persistent_cache()
+
+
+def snapshot_main(argv: List[str]) -> None:
+    """
+    Build a snapshot of the version tags of every action referenced in the given folders, for use with --snapshot.
+
+    Accepts the same options as an update run to find the files and look up the actions, plus the output file.
+
+    Arguments:
+        argv (List[str]): The command-line arguments following 'snapshot'.
+    """
+    parser: argparse.ArgumentParser = build_argument_parser()
+    parser.prog = "update.py snapshot"
+    parser.description = "Build a snapshot of the version tags of every referenced action, for runs with --snapshot or --offline."
+    parser.add_argument("command", choices=["build"], help="The snapshot command to run.")
+    parser.add_argument("--output", required=True, help="The snapshot file to write.")
+
+    args: argparse.Namespace = parser.parse_args(argv)
+    extensions, excludes, includes = get_file_filters(args)
+
+    folder_paths: List[str] = get_folder_paths(args.path, args.manifest, args.shard, args.verbose)
+    github_token: Optional[str] = configure_api(args)
+
+    if not args.no_cache:
+        open_persistent_cache(args.cache_file, args.cache_ttl, args.cache_max_entries, args.verbose, args.negative_cache_ttl)
+
+    session: requests.Session = create_http_session(args.pool_size)
+
+    try:
+        file_paths: List[str] = list(find_fleet_action_files(folder_paths, extensions, args.recursive, args.discovery, excludes, includes,
+                                                             args.workflows_only))
+        references: Counter = collect_action_references(file_paths, args.jobs, args.mmap_threshold)
+        resolved: Dict[Tuple[str, str], Optional[Tuple[str, str]]] = resolve_actions(
+            references, github_token, args.verbose, args.max_workers, session, args.resolver, args.engine
+        )
+        snapshot: Dict[str, List[List[str]]] = build_snapshot(resolved)
+    finally:
+        session.close()
+        close_persistent_cache()
+
+    try:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({"created_at": int(time.time()), "actions": snapshot}, file, indent=2, sort_keys=True)
+    except (IOError, OSError) as e:
+        print(f"Error writing snapshot {args.output}: {e}")
+        sys.exit(1)
+
+    print(f"Wrote {len(snapshot)} of {len(resolved)} referenced actions to {args.output}.")
+
+
+def serve_cache_main(argv: List[str]) -> None:
+    """
+    Run a shared cache server that resolves each action once and serves the result to every run pointed at it with --cache-url.
+
+    Accepts the same options as an update run to look up actions, plus the address to listen on.
+
+    Arguments:
+        argv (List[str]): The command-line arguments following 'serve-cache'.
+    """
+    parser: argparse.ArgumentParser = build_argument_parser()
+    parser.prog = "update.py serve-cache"
+    parser.description = "Serve the latest versions of actions to many runs of the updater, looking each one up upstream once."
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on. Default is 127.0.0.1.")
+    parser.add_argument("--port", type=int, default=DEFAULT_CACHE_SERVER_PORT, help=f"Port to listen on. Default is {DEFAULT_CACHE_SERVER_PORT}.")
+
+    args: argparse.Namespace = parser.parse_args(argv)
+    if args.deadline is not None:
+        print("--deadline cannot be used with serve-cache, the server keeps looking actions up until it is stopped.")
+        sys.exit(1)
+    github_token: Optional[str] = configure_api(args)
+
+    if not args.no_cache:
+        open_persistent_cache(args.cache_file, args.cache_ttl, args.cache_max_entries, args.verbose, args.negative_cache_ttl)
+
+    session: requests.Session = create_http_session(args.pool_size)
+
+    try:
+        server: CacheServer = CacheServer((args.host, args.port), github_token, args.verbose, session, args.resolver,
+                                          args.cache_ttl, args.negative_cache_ttl)
+    except OSError as e:
+        print(f"Unable to listen on {args.host}:{args.port}: {e}")
+        session.close()
+        close_persistent_cache()
+        sys.exit(1)
+
+    print(f"Serving action versions on http://{args.host}:{server.server_address[1]}/v1/actions/<owner>/<repo>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        session.close()
+        close_persistent_cache()
+
+
+class CacheServer(ThreadingHTTPServer):  # pylint: disable=too-many-instance-attributes
+    """A threaded HTTP server that looks up each action once and answers every later request for it from memory until it expires."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], github_token: Optional[str], verbose: bool, session: requests.Session, resolver: str = "rest",
+                 ttl: int = DEFAULT_CACHE_TTL, negative_ttl: int = DEFAULT_NEGATIVE_CACHE_TTL) -> None:
+        """
+        Start listening.
+
+        Arguments:
+            address (Tuple[str, int]): The host and port to listen on; port 0 picks a free port.
+            github_token (Optional[str]): GitHub personal access token for the upstream lookups.
+            verbose (bool): If True, prints detailed information and every request.
+            session (requests.Session): The HTTP session upstream lookups are sent through.
+            resolver (str): The API used to look up versions, either 'rest' or 'graphql'.
+            ttl (int): Seconds a resolved version is served before it is looked up again.
+            negative_ttl (int): Seconds an action that could not be resolved is reported as such before it is looked up again.
+        """
+        super().__init__(address, CacheRequestHandler)
+        self.github_token: Optional[str] = github_token
+        self.verbose: bool = verbose
+        self.session: requests.Session = session
+        self.resolver: str = resolver
+        self.ttl: int = ttl
+        self.negative_ttl: int = negative_ttl
+        self.expires: Dict[Tuple[str, str], float] = {}
+        self.expires_lock = threading.Lock()
+
+    def lookup(self, owner: str, repo: str) -> Tuple[Optional[Tuple[str, str]], Optional[str]]:
+        """
+        Resolve an action, from memory while its entry has not expired.
+
+        Concurrent requests for the same action share one upstream lookup. Failures that retrying may fix, such as
+        network errors and rate limits, are not kept, and a rate limit only stops upstream lookups until it has reset.
+
+        Arguments:
+            owner (str): The owner of the GitHub repository.
+            repo (str): The name of the GitHub repository.
+
+        Returns:
+            Tuple[Optional[Tuple[str, str]], Optional[str]]: The latest version tag and SHA, and the reason it could not be resolved, if any.
+        """
+        key: Tuple[str, str] = (owner, repo)
+        with self.expires_lock:
+            if self.expires.get(key, 0) <= time.time():
+                version_cache.pop(key, None)
+                failure_cache.pop(key, None)
+                self.expires[key] = time.time() + self.ttl
+
+        clear_rate_limit_flag()
+        latest: Optional[Tuple[str, str]] = get_latest_version(owner, repo, self.github_token, self.verbose, self.session, self.resolver)
+        reason: Optional[str] = failure_cache.get(key)
+
+        if latest is None:
+            with self.expires_lock:
+                self.expires[key] = time.time() + self.negative_ttl if reason else 0
+        return latest, reason
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for CacheServer."""
+
+    server: CacheServer
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        """Only log requests in verbose mode."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve the latest version of the action at /v1/actions/<owner>/<repo>."""
+        match: Optional[re.Match] = CACHE_SERVER_PATH_PATTERN.fullmatch(self.path.split("?", 1)[0])
+        if match is None:
+            self.send_json(404, {"message": "Not Found"})
+            return
+
+        owner, repo = match.group('owner', 'repo')
+        latest, reason = self.server.lookup(owner, repo)
+        if latest:
+            self.send_json(200, {"owner": owner, "repo": repo, "tag": latest[0], "sha": latest[1]})
+        elif reason:
+            self.send_json(404, {"owner": owner, "repo": repo, "reason": reason})
+        else:
+            self.send_json(503, {"owner": owner, "repo": repo, "message": "The action could not be looked up, try again later."})
+
+    def send_json(self, status: int, body: Any) -> None:
+        """
+        Send a JSON response.
+
+        Arguments:
+            status (int): The HTTP status code.
+            body (Any): The value to encode as the response body.
+        """
+        payload: bytes = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def build_snapshot(resolved: Mapping[Tuple[str, str], Optional[Tuple[str, str]]]) -> Dict[str, List[List[str]]]:
+    """
+    Collect the version index of every resolved action for a snapshot.
+
+    Arguments:
+        resolved (Mapping[Tuple[str, str], Optional[Tuple[str, str]]]): The latest version tag and SHA for each (owner, repo) pair.
+
+    Returns:
+        Dict[str, List[List[str]]]: The stable version tags and SHAs of each resolved action, newest first, keyed by 'owner/repo'.
+    """
+    snapshot: Dict[str, List[List[str]]] = {}
+
+    for (owner, repo), latest in sorted(resolved.items()):
+        if latest is None:
+            continue
+        index: List[Tuple[str, str]] = version_indexes.get((owner, repo)) or load_version_index(owner, repo) or [latest]
+        snapshot[f"{owner}/{repo}"] = [list(entry) for entry in index]
+
+    return snapshot
+
+
+def load_snapshot(snapshot_path: str) -> Dict[Tuple[str, str], List[Tuple[str, str]]]:
+    """
+    Read a snapshot written by 'snapshot build'.
+
+    Arguments:
+        snapshot_path (str): The path to the snapshot file.
+
+    Returns:
+        Dict[Tuple[str, str], List[Tuple[str, str]]]: The stable version tags and SHAs of each action, newest first.
+    """
+    try:
+        with open(snapshot_path, 'r', encoding='utf-8') as file:
+            actions: Dict[str, Any] = json.load(file)["actions"]
+        return {tuple(name.split("/", 1)): [tuple(entry) for entry in index] for name, index in actions.items() if index}
+    except (IOError, OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Error reading snapshot {snapshot_path}: {e}")
+        sys.exit(1)
+
+
+def set_offline_mode(snapshot_path: Optional[str], offline: bool, verbose: bool = False) -> None:
+    """
+    Load the snapshot used to resolve actions, and choose whether actions missing from it may be looked up online.
+
+    Arguments:
+        snapshot_path (Optional[str]): The snapshot file to load, if any.
+        offline (bool): If True, no API requests are sent and actions are only resolved from the snapshot and the cache.
+        verbose (bool): If True, prints detailed information.
+    """
+    global snapshot_index, offline_mode
+
+    snapshot_index = load_snapshot(snapshot_path) if snapshot_path else {}
+    offline_mode = offline
+    if verbose and snapshot_path:
+        print(f"Loaded {len(snapshot_index)} actions from snapshot {snapshot_path}.")
+
+
+def merge_main(argv: List[str]) -> None:
+    """
+    Combine the results files written by several sharded runs and print the overall summary.
+
+    Each shard is counted once, so a results file given twice does not inflate the totals, and all files must come
+    from runs split into the same number of shards.
+
+    Arguments:
+        argv (List[str]): The command-line arguments following 'merge'.
+    """
+    parser = argparse.ArgumentParser(prog="update.py merge", description="Merge the --results-json files of sharded runs into one summary.")
+    parser.add_argument("results", nargs="+", help="The results files to merge.")
+    parser.add_argument("--output", help="Write the merged results to this JSON file.")
+
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    root_stats: Dict[str, Dict[str, int]] = {}
+    shards: Set[int] = set()
+    shard_count: Optional[int] = None
+
+    for results_path in args.results:
+        try:
+            with open(results_path, 'r', encoding='utf-8') as file:
+                results: Dict[str, Any] = json.load(file)
+        except (IOError, OSError, ValueError) as e:
+            print(f"Error reading results {results_path}: {e}")
+            sys.exit(1)
+
+        shard: Optional[Dict[str, int]] = results.get("shard")
+        if shard:
+            if shard_count is not None and shard["count"] != shard_count:
+                print(f"Error: {results_path} is shard {shard['index']} of {shard['count']}, but other results are from {shard_count} shards.")
+                sys.exit(1)
+            shard_count = shard["count"]
+            if shard["index"] in shards:
+                print(f"Warning: skipping {results_path}, the results of shard {shard['index']} were already merged.")
+                continue
+            shards.add(shard["index"])
+
+        for root, stats in results.get("repositories", {}).items():
+            merge_stats(root_stats.setdefault(root, {'total_files': 0, 'files_updated': 0, 'total_changes': 0}), stats)
+
+    if shard_count is not None:
+        missing: List[str] = [str(index) for index in range(1, shard_count + 1) if index not in shards]
+        if missing:
+            print(f"Warning: no results for shards {', '.join(missing)} of {shard_count}.")
+
+    stats: Dict[str, int] = {'total_files': 0, 'files_updated': 0, 'total_changes': 0}
+    for other in root_stats.values():
+        merge_stats(stats, other)
+
+    if args.output:
+        write_results(args.output, root_stats)
+    if len(root_stats) > 1:
+        print_root_summary(root_stats)
+    print_summary(stats)
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a shard given as 'i/N' on the command line.
+
+    Arguments:
+        value (str): The shard, with a 1-based index i and a shard count N.
+
+    Returns:
+        Tuple[int, int]: The shard index and the shard count.
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected i/N") from e
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', i must be between 1 and N")
+    return index, count
+
+
+def select_shard(folder_paths: List[str], index: int, count: int, shard_keys: Optional[List[str]] = None) -> List[str]:
+    """
+    Select the folders belonging to one shard.
+
+    Folders are assigned to shards by a hash of their key, so a folder stays in the same shard however the list is
+    ordered and when other folders are added or removed. Keys must not depend on where the runner keeps its checkout,
+    so manifest entries are hashed as written rather than after being resolved against the manifest's location.
+
+    Arguments:
+        folder_paths (List[str]): All folders to update.
+        index (int): The 1-based index of the shard to select.
+        count (int): The total number of shards.
+        shard_keys (Optional[List[str]]): The key of each folder. Defaults to the folder paths as given.
+
+    Returns:
+        List[str]: The folders in the selected shard, in their original order.
+    """
+    return [folder_path for folder_path, key in zip(folder_paths, shard_keys or folder_paths)
+            if int(hashlib.sha256(os.path.normpath(key).encode('utf-8')).hexdigest(), 16) % count == index - 1]
+
+
+def write_results(results_path: str, root_stats: Dict[str, Dict[str, int]], shard: Optional[Tuple[int, int]] = None) -> None:
+    """
+    Write the statistics of each folder to a JSON file.
+
+    Arguments:
+        results_path (str): The path of the JSON file to write.
+        root_stats (Dict[str, Dict[str, int]]): Stats about total files, updated files, and changes made, keyed by folder.
+        shard (Optional[Tuple[int, int]]): The shard index and count of the run, if it was sharded.
+    """
+    total: Dict[str, int] = {'total_files': 0, 'files_updated': 0, 'total_changes': 0}
+    for stats in root_stats.values():
+        merge_stats(total, stats)
+
+    results: Dict[str, Any] = {
+        "shard": {"index": shard[0], "count": shard[1]} if shard else None,
+        "repositories": root_stats,
+        "total": total,
+    }
+
+    try:
+        with open(results_path, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    except (IOError, OSError) as e:
+        print(f"Error writing results {results_path}: {e}")
+
+
+def get_file_filters(args: argparse.Namespace) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Split the comma-separated file options given on the command line.
+
+    Arguments:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        Tuple[List[str], List[str], List[str]]: The file extensions with a dot prefix, the exclude patterns and the include patterns.
+    """
+    extensions: List[str] = [f".{ext.strip()}" for ext in args.extensions.split(",")]
+    excludes: List[str] = [pattern.strip() for pattern in args.exclude.split(",") if pattern.strip()]
+    includes: List[str] = [pattern.strip() for pattern in args.include.split(",") if pattern.strip()]
+    return extensions, excludes, includes
+
+
+def get_folder_paths(paths: Optional[List[str]], manifest_path: Optional[str], shard: Optional[Tuple[int, int]], verbose: bool) -> List[str]:
+    """
+    Build the list of folders to update from the command line.
+
+    Arguments:
+        paths (Optional[List[str]]): The folders given with --path.
+        manifest_path (Optional[str]): The manifest file listing more folders, if any.
+        shard (Optional[Tuple[int, int]]): The shard index and count to select, if the run is sharded.
+        verbose (bool): If True, prints detailed information.
+
+    Returns:
+        List[str]: The folders to update, defaulting to the current directory.
+    """
+    folder_paths: List[str] = list(paths or [])
+    shard_keys: List[str] = list(folder_paths)
+    if manifest_path:
+        for entry, folder_path in read_manifest(manifest_path):
+            shard_keys.append(entry)
+            folder_paths.append(folder_path)
+    if not folder_paths:
+        folder_paths = shard_keys = ["."]
+
+    if shard:
+        folder_paths = select_shard(folder_paths, *shard, shard_keys)
+        if verbose:
+            print(f"Shard {shard[0]}/{shard[1]} has {len(folder_paths)} folders.")
+
+    return folder_paths
+
+
+def read_manifest(manifest_path: str) -> List[Tuple[str, str]]:
+    """
+    Read the list of folders to update from a manifest file.
+
+    The manifest lists one folder per line. Blank lines and lines starting with '#' are ignored, and relative paths are
+    resolved against the directory containing the manifest.
+
+    Arguments:
+        manifest_path (str): The path to the manifest file.
+
+    Returns:
+        List[Tuple[str, str]]: Each entry as written in the manifest, and the folder it resolves to.
+    """
+    manifest_dir: str = os.path.dirname(os.path.abspath(manifest_path))
+    folder_paths: List[Tuple[str, str]] = []
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                entry: str = line.strip()
+                if entry and not entry.startswith("#"):
+                    folder_paths.append((entry, os.path.join(manifest_dir, os.path.expanduser(entry))))
+    except (IOError, OSError) as e:
+        print(f"Error reading manifest {manifest_path}: {e}")
+        sys.exit(1)
+
+    return folder_paths
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser for the command-line arguments of an update run.
+
+    Returns:
+        argparse.ArgumentParser: The argument parser.
+    """
+    parser = argparse.ArgumentParser(description="Update GitHub Actions in a folder to the latest version.")
+    parser.add_argument("--path", action="append",
+                        help="Path to the folder containing GitHub Actions files. Repeat to update several repositories in one run. "
+                             "Default is current directory.")
+    parser.add_argument("--manifest", help="File listing the folders to update, one per line. Relative paths are relative to the manifest.")
+    parser.add_argument("--shard", type=parse_shard,
+                        help="Only update the folders in shard i of N, given as 'i/N' (1-based), so a fleet can be split across several runners.")
+    parser.add_argument("--results-json", help="Write the statistics of each folder to this JSON file, for use with the 'merge' command.")
+    parser.add_argument("--github-token", help="GitHub personal access token for authenticated requests.")
+    parser.add_argument("--github-tokens-file",
+                        help="File with one GitHub token per line. Requests rotate between all tokens, including any in $GITHUB_TOKENS.")
+    parser.add_argument("--api-url", default=GITHUB_API_URL, help=f"Base URL of the GitHub API, e.g. for GitHub Enterprise. Default is {GITHUB_API_URL}.")
+    parser.add_argument("--dry-run", action="store_true", help="Print changes without modifying files.")
+    parser.add_argument("--backup", action="store_true", help="Create a backup of each file before updating.")
+    parser.add_argument("--extensions", default="yml,yaml", help="Comma-separated list of file extensions to check. Default is 'yml,yaml'.")
+    parser.add_argument("--recursive", action="store_true", help="Recursively search for files in subdirectories.")
+    parser.add_argument("--discovery", choices=DISCOVERY_MODES, default="walk",
+                        help="How files are found: 'walk' (every file under --path) or 'git' (files tracked by git). Default is 'walk'.")
+    parser.add_argument("--exclude", default="",
+                        help="Comma-separated glob patterns of files and directories to skip, e.g. 'node_modules,.venv,vendor'. "
+                             "Directories named 'backups' are always skipped.")
+    parser.add_argument("--include", default="", help="Comma-separated glob patterns; if given, only matching files are checked.")
+    parser.add_argument("--workflows-only", action="store_true", help="Only check files in the .github/workflows directory of --path.")
+    parser.add_argument("--verbose", action="store_true", help="Print detailed information about the update process.")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Maximum number of concurrent GitHub API lookups. Default is {DEFAULT_MAX_WORKERS}.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes used to scan and rewrite files. Default is 1.")
+    parser.add_argument("--scan-mode", choices=SCAN_MODES, default="buffer",
+                        help="How files are scanned: 'buffer' (one pass over the whole file) or 'lines' (line by line). Default is 'buffer'.")
+    parser.add_argument("--mmap-threshold", type=int, default=DEFAULT_MMAP_THRESHOLD,
+                        help=f"Files of at least this many bytes are memory mapped and only read if they contain an action reference. "
+                             f"0 disables memory mapping. Default is {DEFAULT_MMAP_THRESHOLD}.")
+    parser.add_argument("--resolver", choices=RESOLVERS, default="rest",
+                        help="API used to look up versions: 'rest' (one request per action) or 'graphql' (batched, requires a token). Default is 'rest'.")
+    parser.add_argument("--engine", choices=ENGINES, default="threads",
+                        help="How REST lookups run concurrently: 'threads' or 'asyncio' (requires aiohttp). Default is 'threads'.")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help=f"Number of keep-alive connections to keep open to the GitHub API. Default is {DEFAULT_POOL_SIZE}.")
+    parser.add_argument("--http-retries", type=int, default=DEFAULT_HTTP_RETRIES,
+                        help=f"Number of times a request that failed with a connection error, timeout, 5xx or rate limit is retried. "
+                             f"Default is {DEFAULT_HTTP_RETRIES}.")
+    parser.add_argument("--retry-backoff", type=float, default=DEFAULT_RETRY_BACKOFF,
+                        help=f"Seconds before the first retry, doubled on every further retry and randomised. Default is {DEFAULT_RETRY_BACKOFF}.")
+    parser.add_argument("--request-timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help=f"Seconds before a single API request times out. Default is {DEFAULT_REQUEST_TIMEOUT:g}.")
+    parser.add_argument("--deadline", type=float,
+                        help="Seconds after which no more API requests are sent or retried; actions not resolved by then are left unchanged.")
+    parser.add_argument("--cache-file", default=default_cache_path(), help="Path to the persistent version cache. Default is under the XDG cache directory.")
+    parser.add_argument("--cache-ttl", type=int, default=DEFAULT_CACHE_TTL,
+                        help=f"Seconds before a cached version is revalidated with GitHub. Default is {DEFAULT_CACHE_TTL}.")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_CACHE_MAX_ENTRIES,
+                        help=f"Maximum number of actions kept in the persistent cache. Default is {DEFAULT_CACHE_MAX_ENTRIES}.")
+    parser.add_argument("--negative-cache-ttl", type=int, default=DEFAULT_NEGATIVE_CACHE_TTL,
+                        help=f"Seconds before an action that was not found, had no version tags or could not be read is looked up again. "
+                             f"Default is {DEFAULT_NEGATIVE_CACHE_TTL}.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the persistent version cache.")
+    parser.add_argument("--cache-url",
+                        help="Base URL of a shared cache server started with 'serve-cache'. Actions are looked up through it instead of the GitHub API.")
+    parser.add_argument("--snapshot", help="Resolve actions from a snapshot written by 'snapshot build' before asking the GitHub API.")
+    parser.add_argument("--mirror-root",
+                        help="Directory of bare git mirrors laid out as <owner>/<repo>.git. Actions with a mirror are resolved from it instead of the API.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Send no API requests; actions are only resolved from the snapshot and the persistent cache, whatever its age.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse the action references of files unchanged since the last run, from an index kept in the version cache.")
+    return parser
+
+
+def configure_api(args: argparse.Namespace) -> Optional[str]:
+    """
+    Apply the command-line options that control how the GitHub API is reached.
+
+    Arguments:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        Optional[str]: The token to pass to the updater.
+    """
+    set_api_url(args.api_url)
+    set_retry_policy(args.http_retries, args.retry_backoff, args.request_timeout, args.deadline)
+    set_offline_mode(args.snapshot, args.offline, args.verbose)
+    set_mirror_root(args.mirror_root)
+    set_cache_url(args.cache_url)
+    return configure_github_tokens(args.github_token, args.github_tokens_file)
+
+
+def configure_github_tokens(github_token: Optional[str], tokens_file: Optional[str]) -> Optional[str]:
+    """
+    Set up the token pool from --github-token, --github-tokens-file and the GITHUB_TOKENS environment variable.
+
+    Arguments:
+        github_token (Optional[str]): The token given with --github-token, if any.
+        tokens_file (Optional[str]): The file listing one token per line, if any.
+
+    Returns:
+        Optional[str]: The token to pass to the updater, so that features requiring a token are enabled when only a pool is given.
+    """
+    tokens: List[str] = [github_token] if github_token else []
+
+    if tokens_file:
+        try:
+            with open(tokens_file, 'r', encoding='utf-8') as file:
+                tokens.extend(line.strip() for line in file if line.strip() and not line.strip().startswith("#"))
+        except (IOError, OSError) as e:
+            print(f"Error reading GitHub tokens from {tokens_file}: {e}")
+            sys.exit(1)
+
+    tokens.extend(os.environ.get("GITHUB_TOKENS", "").replace(",", " ").split())
+
+    set_github_tokens(tokens if len(tokens) > 1 else [])
+    return tokens[0] if tokens else None
+
+
+def set_github_tokens(tokens: Iterable[str]) -> None:
+    """
+    Set the pool of GitHub tokens that API requests rotate through.
+
+    Arguments:
+        tokens (Iterable[str]): The tokens; duplicates are ignored. An empty pool sends every request with the caller's token.
+    """
+    global github_tokens
+
+    with rate_limit_lock:
+        github_tokens = list(dict.fromkeys(token for token in tokens if token))
+
+
+def acquire_github_token(github_token: Optional[str], resource: str = "core") -> Optional[str]:
+    """
+    Pick the token to send the next request with.
+
+    Requests rotate through the pool, preferring the token with the most remaining budget. Tokens whose budget is used
+    up are retired until their reset time, unless every token is exhausted, in which case the one that resets first is used.
+
+    Arguments:
+        github_token (Optional[str]): The token given by the caller, used when there is no pool.
+        resource (str): The rate limited API resource, 'core' for REST or 'graphql'.
+
+    Returns:
+        Optional[str]: The token to authenticate the request with.
+    """
+    global github_token_turn
+
+    with rate_limit_lock:
+        if not github_tokens:
+            return github_token
+
+        now: float = time.time()
+        github_token_turn = (github_token_turn + 1) % len(github_tokens)
+        rotation: List[str] = github_tokens[github_token_turn:] + github_tokens[:github_token_turn]
+        return max(rotation, key=lambda token: get_token_score(token, resource, now))
+
+
+def get_token_score(github_token: Optional[str], resource: str, now: float) -> float:
+    """
+    Rank a token by its remaining budget. The caller must hold rate_limit_lock.
+
+    Arguments:
+        github_token (Optional[str]): The token.
+        resource (str): The rate limited API resource.
+        now (float): The current time.
+
+    Returns:
+        float: The remaining budget, infinity if unknown or past its reset, or minus the reset time if it is used up.
+    """
+    key: Tuple[Optional[str], str] = (github_token, resource)
+    remaining: Optional[int] = rate_limit_remaining.get(key)
+
+    if remaining is None or rate_limit_reset.get(key, 0) <= now:
+        return float("inf")
+    return remaining if remaining > 0 else -rate_limit_reset[key]
+
+
+def has_available_github_token(resource: str = "core") -> bool:
+    """
+    Check whether the token pool still has a token with budget left.
+
+    Arguments:
+        resource (str): The rate limited API resource.
+
+    Returns:
+        bool: True if another request can be sent without waiting for a reset.
+    """
+    with rate_limit_lock:
+        now: float = time.time()
+        return any(get_token_score(token, resource, now) > 0 for token in github_tokens)
+
+
+class InvalidTokenError(RuntimeError):
+    """Raised by the asyncio engine when GitHub rejects the token and there is no other token to use."""
+
+
+def discard_invalid_token(github_token: Optional[str]) -> bool:
+    """
+    Remove a rejected token from the pool.
+
+    Arguments:
+        github_token (Optional[str]): The token GitHub rejected.
+
+    Returns:
+        bool: True if the token was removed and other tokens are left to retry with.
+    """
+    global github_tokens
+
+    with rate_limit_lock:
+        if github_token in github_tokens and len(github_tokens) > 1:
+            github_tokens = [token for token in github_tokens if token != github_token]
+            print(f"A GitHub token was rejected and has been removed from the pool, {len(github_tokens)} tokens left.")
+            return True
+    return False
+
+
+def handle_invalid_token(github_token: Optional[str]) -> None:
+    """
+    Remove a rejected token from the pool, or stop the run if there is no other token to use.
+
+    Arguments:
+        github_token (Optional[str]): The token GitHub rejected.
+    """
+    if discard_invalid_token(github_token):
+        return
+
+    print("Invalid GitHub token. Please provide a valid token and try again.")
+    sys.exit(1)
+
+
+def set_api_url(api_url: str) -> None:
+    """
+    Point all GitHub API requests at a different base URL.
+
+    Arguments:
+        api_url (str): The base URL of the API, e.g. https://github.example.com/api/v3 for GitHub Enterprise.
+    """
+    global GITHUB_API_URL, GITHUB_TAGS_API_URL, GITHUB_GRAPHQL_API_URL
+
+    GITHUB_API_URL = api_url.rstrip("/")
+    GITHUB_TAGS_API_URL = GITHUB_API_URL + "/repos/{owner}/{repo}/tags"
+    GITHUB_GRAPHQL_API_URL = GITHUB_API_URL + "/graphql"
+
+
+def create_http_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Create an HTTP session that keeps a pool of warm connections to the GitHub API.
+
+    Failed requests are retried by send_github_request rather than by the connection adapter, so that retries
+    respect the rate limit budget, the token pool and the run deadline.
+
+    Arguments:
+        pool_size (int): The maximum number of connections kept open per host.
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    adapter: HTTPAdapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session: requests.Session = requests.Session()
+    session.headers.update({"Accept": "application/vnd.github+json", "Connection": "keep-alive"})
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def set_retry_policy(retries: int = DEFAULT_HTTP_RETRIES, backoff: float = DEFAULT_RETRY_BACKOFF, timeout: float = DEFAULT_REQUEST_TIMEOUT,
+                     deadline: Optional[float] = None) -> None:
+    """
+    Configure how API requests time out and are retried.
+
+    Arguments:
+        retries (int): The number of times a failed request is retried.
+        backoff (float): The seconds before the first retry, doubled on every further retry.
+        timeout (float): The seconds before a single request times out.
+        deadline (Optional[float]): The seconds from now after which no request is sent or retried, or None for no deadline.
+    """
+    global http_retries, retry_backoff, request_timeout, run_deadline
+
+    http_retries = max(0, retries)
+    retry_backoff = max(0.0, backoff)
+    request_timeout = timeout
+    run_deadline = time.time() + deadline if deadline is not None else None
+
+
+def get_retry_delay(attempt: int, description: str, error: str) -> Optional[float]:
+    """
+    Work out how long to wait before retrying a failed request, using exponential backoff with full jitter.
+
+    Arguments:
+        attempt (int): The number of retries already made for the request.
+        description (str): What the request was for, used in messages.
+        error (str): Why the request failed, used in messages.
+
+    Returns:
+        Optional[float]: The seconds to wait, or None if the request should not be retried.
+    """
+    if attempt >= http_retries:
+        print(f"Giving up on {description} after {attempt + 1} attempts ({error}).")
+        return None
+
+    delay: float = random.uniform(0, min(MAX_RETRY_BACKOFF, retry_backoff * 2 ** attempt))  # nosec B311 - jitter, not security
+    if run_deadline is not None and max(time.time() + delay, rate_limit_retry_at) >= run_deadline:
+        print(f"Not retrying {description} ({error}), the run deadline would be exceeded.")
+        return None
+
+    if delay >= 1:
+        print(f"Retrying {description} in {delay:.1f} seconds after {error} (attempt {attempt + 2} of {http_retries + 1}).")
+    return delay
+
+
+def is_past_deadline(description: str) -> bool:
+    """
+    Check whether the run deadline has passed, so that no further requests should be sent.
+
+    Arguments:
+        description (str): What the request was for, used in messages.
+
+    Returns:
+        bool: True if the request should be skipped.
+    """
+    if run_deadline is not None and time.time() >= run_deadline:
+        print(f"Run deadline reached. Skipping {description}.")
+        return True
+    return False
+
+
+def wait_exceeds_deadline(wait_time: float) -> bool:
+    """
+    Check whether waiting before the next request would run past the run deadline.
+
+    Arguments:
+        wait_time (float): The number of seconds to wait.
+
+    Returns:
+        bool: True if the wait would end at or after the deadline.
+    """
+    return run_deadline is not None and wait_time > 0 and time.time() + wait_time >= run_deadline
+
+
+def build_request_headers(github_token: Optional[str], etag: Optional[str] = None, last_modified: Optional[str] = None) -> Dict[str, str]:
+    """
+    Build the headers of a request for the tags of a repository.
+
+    Arguments:
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        etag (Optional[str]): The ETag of a previous response, sent as If-None-Match.
+        last_modified (Optional[str]): The Last-Modified value of a previous response, sent as If-Modified-Since.
+
+    Returns:
+        Dict[str, str]: The request headers.
+    """
+    headers: Dict[str, str] = {"Authorization": f"token {github_token}"} if github_token else {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def get_http_session() -> requests.Session:
+    """
+    Return the shared module-level HTTP session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global http_session
+
+    with http_session_lock:
+        if http_session is None:
+            http_session = create_http_session()
+        return http_session
+
+
+def get_latest_version(owner: str, repo: str, github_token: Optional[str], verbose: bool,
+                       session: Optional[requests.Session] = None, resolver: str = "rest") -> Optional[Tuple[str, str]]:
+    """
+    Fetch the latest version tag and corresponding SHA for a given GitHub repo.
+
+    Concurrent calls for the same repository are coalesced: the first caller performs the lookup and the others
+    wait for its result instead of sending duplicate requests.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+        session (Optional[requests.Session]): The HTTP session to send requests through. Defaults to the shared session.
+        resolver (str): The API used to look up the version, either 'rest' or 'graphql'.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails or is rate-limited.
+    """
+    cached_result: Tuple[str] | None = get_cached_version(owner, repo)
+    if cached_result or is_cached_failure(owner, repo, github_token, verbose):
+        return cached_result
+    if offline_mode:
+        return get_offline_version(owner, repo, verbose)
+
+    with inflight_requests_lock:
+        future: Optional[Future] = inflight_requests.get((owner, repo))
+        is_leader: bool = future is None
+        if future is None:
+            future = inflight_requests[(owner, repo)] = Future()
+
+    if not is_leader:
+        return future.result()
+
+    try:
+        # Another caller may have finished the lookup between the cache check and registering this one
+        result: Optional[Tuple[str, str]] = version_cache.get((owner, repo)) or (
+            fetch_from_cache_server(owner, repo, github_token, verbose, session, resolver) if cache_url
+            else fetch_latest_version(owner, repo, github_token, verbose, session, resolver)
+        )
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with inflight_requests_lock:
+            del inflight_requests[(owner, repo)]
+
+
+def fetch_latest_version(owner: str, repo: str, github_token: Optional[str], verbose: bool,
+                         session: Optional[requests.Session] = None, resolver: str = "rest") -> Optional[Tuple[str, str]]:
+    """
+    Look up the latest version tag and corresponding SHA for a given GitHub repo from the API, bypassing the fresh cache.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+        session (Optional[requests.Session]): The HTTP session to send requests through. Defaults to the shared session.
+        resolver (str): The API used to look up the version, either 'rest' or 'graphql'.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails or is rate-limited.
+    """
+    if check_rate_limit(verbose):
+        return None
+
+    if resolver == "graphql" and github_token:
+        return resolve_actions_graphql([(owner, repo)], github_token, verbose, session=session).get((owner, repo))
+
+    # A stale cache entry can be revalidated with a conditional request instead of downloading the tags again
+    stale_entry: Optional[Tuple[str, str, Optional[str], Optional[str]]] = get_cache_validators(owner, repo)
+    etag: Optional[str] = stale_entry[2] if stale_entry else None
+    last_modified: Optional[str] = stale_entry[3] if stale_entry else None
+
+    response: requests.Response | None = execute_github_request(owner, repo, github_token, etag, last_modified, session)
+    if response is not None and response.status_code == 304 and stale_entry:
+        if verbose:
+            print(f"Cached version of {owner}/{repo} is still current.")
+        refresh_persistent_version(owner, repo)
+        version_cache[(owner, repo)] = (stale_entry[0], stale_entry[1])
+        return stale_entry[0], stale_entry[1]
+    if response:
+        return handle_version_response(response, owner, repo, github_token, session)
+
+    return None
+
+
+def set_cache_url(url: Optional[str]) -> None:
+    """
+    Send lookups to a shared cache server instead of the GitHub API.
+
+    Arguments:
+        url (Optional[str]): The base URL of the cache server, or None to use the API directly.
+    """
+    global cache_url
+
+    cache_url = url.rstrip("/") if url else None
+
+
+def fetch_from_cache_server(owner: str, repo: str, github_token: Optional[str], verbose: bool,
+                            session: Optional[requests.Session] = None, resolver: str = "rest") -> Optional[Tuple[str, str]]:
+    """
+    Look up the latest version of an action through the shared cache server.
+
+    If the server cannot be reached, this and all later lookups of the run go to the GitHub API directly. Actions the
+    server could not look up for a reason that may go away are looked up directly too.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token, used if the lookup falls back to the API.
+        verbose (bool): If True, prints detailed information.
+        session (Optional[requests.Session]): The HTTP session to send the request through. Defaults to the shared session.
+        resolver (str): The API used if the lookup falls back to the API, either 'rest' or 'graphql'.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if it could not be resolved.
+    """
+    global cache_url
+
+    server_url: Optional[str] = cache_url
+    if server_url is None:
+        return fetch_latest_version(owner, repo, github_token, verbose, session, resolver)
+
+    try:
+        response: requests.Response = (session or get_http_session()).get(f"{server_url}/v1/actions/{owner}/{repo}", timeout=request_timeout)
+        body: Dict[str, Any] = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        with cache_url_lock:
+            if cache_url is not None:
+                print(f"Cache server {server_url} is not available, looking actions up directly: {e}")
+            cache_url = None
+        return fetch_latest_version(owner, repo, github_token, verbose, session, resolver)
+
+    if response.status_code == 200 and body.get("tag") and body.get("sha"):
+        version_cache[(owner, repo)] = (body["tag"], body["sha"])
+        return body["tag"], body["sha"]
+    if response.status_code == 404 and body.get("reason"):
+        failure_cache[(owner, repo)] = body["reason"]
+        if verbose:
+            print(f"Skipping {owner}/{repo}, the cache server could not resolve it: {body['reason']}.")
+        return None
+
+    print(f"The cache server could not look up {owner}/{repo}, looking it up directly: {body.get('message', response.status_code)}")
+    return fetch_latest_version(owner, repo, github_token, verbose, session, resolver)
+
+
+def check_rate_limit(verbose: bool) -> bool:
+    """
+    Check the global rate limit flag.
+
+    Arguments:
+        verbose (bool): If True, prints detailed information.
+
+    Returns:
+        bool: True if the rate limit flag is set, False otherwise.
+    """
+    if rate_limit_exceeded:
+        if verbose:
+            print("Skipping API request due to rate limit.")
+        return True
+    return False
+
+
+def clear_rate_limit_flag() -> None:
+    """
+    Allow API requests again once a pause requested by the API has passed.
+
+    An update run stops looking actions up for good once the flag is set, but a long-running process such as the
+    cache server must not stay blocked after the limit has reset, or after a 403 that was not a rate limit at all.
+    """
+    global rate_limit_exceeded
+
+    with rate_limit_lock:
+        if rate_limit_exceeded and time.time() >= rate_limit_retry_at:
+            rate_limit_exceeded = False
+
+
+def get_cached_version(owner: str, repo: str) -> Optional[Tuple[str, str]]:
+    """
+    Check if the latest version is available in the in-memory cache, the snapshot, a local mirror or, failing those, the persistent cache.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+
+    Returns:
+        Optional[Tuple[str, str]]: The cached version and SHA, or None if not cached.
+    """
+    cached_result: Optional[Tuple[str, str]] = version_cache.get((owner, repo))
+    if cached_result:
+        return cached_result
+
+    if (owner, repo) in snapshot_index:
+        cached_result = version_cache[(owner, repo)] = snapshot_index[(owner, repo)][0]
+        return cached_result
+
+    mirror_path: Optional[str] = find_mirror(owner, repo)
+    if mirror_path:
+        return resolve_from_mirror(mirror_path, owner, repo)
+
+    cached_result = load_persistent_version(owner, repo)
+    if cached_result:
+        version_cache[(owner, repo)] = cached_result
+    return cached_result
+
+
+def set_mirror_root(root: Optional[str]) -> None:
+    """
+    Set the directory of bare git mirrors used to resolve actions without the API.
+
+    Arguments:
+        root (Optional[str]): The mirror directory, or None to always use the API.
+    """
+    global mirror_root
+
+    mirror_root = root
+
+
+def find_mirror(owner: str, repo: str) -> Optional[str]:
+    """
+    Find the bare git mirror of an action under the mirror root.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+
+    Returns:
+        Optional[str]: The path of the mirror, '<owner>/<repo>.git' or '<owner>/<repo>', or None if there is none.
+    """
+    if mirror_root is None or not (ACTION_NAME_PATTERN.fullmatch(owner) and ACTION_NAME_PATTERN.fullmatch(repo)):
+        return None
+
+    for name in (f"{repo}.git", repo):
+        mirror_path: str = os.path.join(mirror_root, owner, name)
+        if os.path.isdir(os.path.join(mirror_path, "refs")):
+            return mirror_path
+    return None
+
+
+def resolve_from_mirror(mirror_path: str, owner: str, repo: str) -> Optional[Tuple[str, str]]:
+    """
+    Resolve the latest version of an action from its local mirror, which takes the place of the API for it.
+
+    Arguments:
+        mirror_path (str): The path of the bare git mirror.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the mirror has no stable version tags.
+    """
+    index: List[Tuple[str, str]] = build_version_index(read_mirror_tags(mirror_path))
+    if not index:
+        failure_cache[(owner, repo)] = "no stable version tags in the mirror"
+        return None
+
+    version_cache[(owner, repo)] = index[0]
+    version_indexes[(owner, repo)] = index
+    return index[0]
+
+
+def read_mirror_tags(mirror_path: str) -> List[Tuple[str, str]]:
+    """
+    Read the tags of a bare git repository and the commit SHAs they point to, without running git where possible.
+
+    Tags come from packed-refs, where the '^' line following an annotated tag holds its peeled commit, and from loose
+    refs, which take precedence. Tags that are not known to be peeled are peeled from their loose tag object, or by git
+    if the object is packed, and are left out if that fails, so a tag object is never taken for a commit.
+
+    Arguments:
+        mirror_path (str): The path of the bare git mirror.
+
+    Returns:
+        List[Tuple[str, str]]: The tag names and their commit SHAs.
+    """
+    tags, unpeeled = read_packed_mirror_tags(mirror_path)
+    read_loose_mirror_tags(mirror_path, tags, unpeeled)
+
+    commits: Dict[str, Optional[str]] = peel_mirror_objects(mirror_path, {tags[tag] for tag in unpeeled})
+    peeled_tags: List[Tuple[str, Optional[str]]] = [(tag, commits.get(sha) if tag in unpeeled else sha) for tag, sha in tags.items()]
+    return [(tag, sha) for tag, sha in peeled_tags if sha]
+
+
+def read_packed_mirror_tags(mirror_path: str) -> Tuple[Dict[str, str], Set[str]]:
+    """
+    Read the tags listed in the packed-refs file of a bare git repository.
+
+    A packed-refs file with the 'peeled' trait follows every annotated tag with its peeled commit, so the tags without
+    one point to commits. Without the trait, any tag may still need peeling.
+
+    Arguments:
+        mirror_path (str): The path of the bare git mirror.
+
+    Returns:
+        Tuple[Dict[str, str], Set[str]]: The SHA of each tag, and the tags whose SHA may not be a commit.
+    """
+    tags: Dict[str, str] = {}
+    unpeeled: Set[str] = set()
+
+    try:
+        with open(os.path.join(mirror_path, "packed-refs"), 'r', encoding='utf-8') as file:
+            peeled: bool = False
+            tag: Optional[str] = None
+            for line in file:
+                line = line.rstrip("\n")
+                if line.startswith("#"):
+                    peeled = "peeled" in line.split(":", 1)[-1].split()
+                elif line.startswith("^"):
+                    if tag is not None:
+                        tags[tag] = line[1:]
+                        unpeeled.discard(tag)
+                else:
+                    sha, _, ref = line.partition(" ")
+                    tag = ref[len("refs/tags/"):] if ref.startswith("refs/tags/") else None
+                    if tag is not None:
+                        tags[tag] = sha
+                        if not peeled:
+                            unpeeled.add(tag)
+    except FileNotFoundError:
+        pass
+    except (IOError, OSError, UnicodeDecodeError) as e:
+        print(f"Error reading the packed refs of {mirror_path}: {e}")
+
+    return tags, unpeeled
+
+
+def read_loose_mirror_tags(mirror_path: str, tags: Dict[str, str], unpeeled: Set[str]) -> None:
+    """
+    Read the loose tag refs of a bare git repository, which take precedence over packed ones and always need peeling.
+
+    Arguments:
+        mirror_path (str): The path of the bare git mirror.
+        tags (Dict[str, str]): The SHA of each tag, updated in place.
+        unpeeled (Set[str]): The tags whose SHA may not be a commit, updated in place.
+    """
+    tags_dir: str = os.path.join(mirror_path, "refs", "tags")
+    for dir_path, _, file_names in os.walk(tags_dir):
+        for file_name in file_names:
+            ref_path: str = os.path.join(dir_path, file_name)
+            tag: str = os.path.relpath(ref_path, tags_dir).replace(os.sep, "/")
+            try:
+                with open(ref_path, 'r', encoding='utf-8') as file:
+                    tags[tag] = file.read().strip()
+                    unpeeled.add(tag)
+            except (IOError, OSError, UnicodeDecodeError) as e:
+                print(f"Error reading the tag {tag} of {mirror_path}: {e}")
+
+
+def peel_mirror_objects(mirror_path: str, shas: Set[str]) -> Dict[str, Optional[str]]:
+    """
+    Find the commits that objects of a bare git repository point to, following annotated tags.
+
+    Loose objects are read directly. Objects stored in pack files are peeled with a single git call, in which an object
+    that cannot be peeled does not affect the others.
+
+    Arguments:
+        mirror_path (str): The path of the bare git mirror.
+        shas (Set[str]): The SHAs of the objects to peel.
+
+    Returns:
+        Dict[str, Optional[str]]: The commit SHA of each object, or None if it does not point to a commit. Objects that
+        could not be read are left out.
+    """
+    commits: Dict[str, Optional[str]] = {}
+    packed: List[str] = []
+
+    for sha in sorted(shas):
+        target: Optional[str] = sha
+        for _ in range(MAX_TAG_PEEL_DEPTH):
+            try:
+                with open(os.path.join(mirror_path, "objects", target[:2], target[2:]), 'rb') as file:
+                    header, _, body = zlib.decompress(file.read()).partition(b"\0")
+            except FileNotFoundError:
+                packed.append(sha)
+                break
+            except (OSError, zlib.error) as e:
+                print(f"Error reading object {target} of {mirror_path}: {e}")
+                target = None
+                break
+            if not header.startswith(b"tag "):
+                commits[sha] = target if header.startswith(b"commit ") else None
+                break
+            target = body.split(b"\n", 1)[0].partition(b"object ")[2].decode('ascii') or None
+            if target is None:
+                break
+        if target is None:
+            commits[sha] = None
+
+    if packed:
+        commits.update(peel_packed_mirror_objects(mirror_path, packed))
+    return commits
+
+
+def peel_packed_mirror_objects(mirror_path: str, shas: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Find the commits that packed objects of a bare git repository point to, using git cat-file.
+
+    Arguments:
+        mirror_path (str): The path of the bare git mirror.
+        shas (List[str]): The SHAs of the objects to peel.
+
+    Returns:
+        Dict[str, Optional[str]]: The commit SHA of each object, or None if it does not point to a commit. Nothing is
+        returned if git is not available.
+    """
+    git: Optional[str] = shutil.which("git")
+    if git is None:
+        print(f"Unable to peel {len(shas)} packed tags of {mirror_path}, git is not installed.")
+        return {}
+
+    try:
+        result: subprocess.CompletedProcess = subprocess.run(  # nosec B603
+            [git, "--git-dir", mirror_path, "cat-file", "--batch-check"], input="".join(f"{sha}^{{commit}}\n" for sha in shas),
+            capture_output=True, check=True, text=True
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Unable to peel the tags of {mirror_path}: {e}")
+        return {}
+
+    commits: Dict[str, Optional[str]] = {}
+    for sha, line in zip(shas, result.stdout.splitlines()):
+        fields: List[str] = line.split()
+        commits[sha] = fields[0] if len(fields) == 3 and fields[1] == "commit" else None
+    return commits
+
+
+def get_offline_version(owner: str, repo: str, verbose: bool) -> Optional[Tuple[str, str]]:
+    """
+    Resolve an action that is neither in the snapshot nor freshly cached without network access, from a stale cache entry.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        verbose (bool): If True, prints detailed information.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest known version tag and SHA, or None if the action is unknown.
+    """
+    index: Optional[List[Tuple[str, str]]] = load_version_index(owner, repo)
+    if index:
+        version_cache[(owner, repo)] = index[0]
+        return index[0]
+
+    if verbose:
+        print(f"Skipping {owner}/{repo}, it is not in the snapshot or the cache and the run is offline.")
+    return None
+
+
+def get_credentials_id(github_token: Optional[str]) -> str:
+    """
+    Identify the credentials requests are sent with, without storing the tokens themselves.
+
+    Arguments:
+        github_token (Optional[str]): The caller's token, used when there is no pool.
+
+    Returns:
+        str: A hash of the token pool or the caller's token, or an empty string for unauthenticated requests.
+    """
+    tokens: List[str] = github_tokens or ([github_token] if github_token else [])
+    return hashlib.sha256("\n".join(tokens).encode('utf-8')).hexdigest() if tokens else ""
+
+
+def get_cached_failure(owner: str, repo: str, github_token: Optional[str] = None) -> Optional[str]:
+    """
+    Check whether looking up an action recently failed for a reason that retrying would not fix.
+
+    Failures that depend on what the credentials can see, such as a private repository answering 404, are only reused
+    from the persistent cache by runs with the same credentials.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+
+    Returns:
+        Optional[str]: The reason the lookup failed, or None if it has not failed within the negative cache TTL.
+    """
+    reason: Optional[str] = failure_cache.get((owner, repo))
+    if reason is not None or persistent_cache is None:
+        return reason
+
+    try:
+        with persistent_cache_lock:
+            row: Optional[Tuple[str]] = persistent_cache.execute(
+                "SELECT reason FROM failures WHERE owner = ? AND repo = ? AND failed_at > ? AND (credentials IS NULL OR credentials = ?)",
+                (owner, repo, time.time() - persistent_cache_negative_ttl, get_credentials_id(github_token))
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error reading {owner}/{repo} from the version cache: {e}")
+        return None
+
+    if row is not None:
+        failure_cache[(owner, repo)] = row[0]
+        return row[0]
+    return None
+
+
+def is_cached_failure(owner: str, repo: str, github_token: Optional[str], verbose: bool) -> bool:
+    """
+    Check whether the lookup of an action should be skipped because it recently failed.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+
+    Returns:
+        bool: True if the lookup failed within the negative cache TTL.
+    """
+    reason: Optional[str] = get_cached_failure(owner, repo, github_token)
+    if reason is not None and verbose:
+        print(f"Skipping {owner}/{repo}, it could not be resolved recently: {reason}.")
+    return reason is not None
+
+
+def store_failure(owner: str, repo: str, reason: str, credentials: Optional[str] = None) -> None:
+    """
+    Record that an action could not be resolved, so that further references to it do not repeat the lookup.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        reason (str): Why the lookup failed.
+        credentials (Optional[str]): The credentials the failure applies to, from get_credentials_id, if it depends on them.
+    """
+    failure_cache[(owner, repo)] = reason
+
+    if persistent_cache is None:
+        return
+
+    try:
+        with persistent_cache_lock:
+            persistent_cache.execute(
+                "INSERT OR REPLACE INTO failures (owner, repo, reason, credentials, failed_at) VALUES (?, ?, ?, ?, ?)",
+                (owner, repo, reason, credentials, time.time())
+            )
+    except sqlite3.Error as e:
+        print(f"Error writing {owner}/{repo} to the version cache: {e}")
+
+
+def store_version(owner: str, repo: str, latest_version: str, latest_sha: str, etag: Optional[str] = None,
+                  last_modified: Optional[str] = None, index: Optional[List[Tuple[str, str]]] = None) -> None:
+    """
+    Record the latest version of an action in the in-memory cache and the persistent cache.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        latest_version (str): The latest version tag.
+        latest_sha (str): The commit SHA of the latest version tag.
+        etag (Optional[str]): The ETag of the response the version was read from, used to revalidate the entry later.
+        last_modified (Optional[str]): The Last-Modified header of the response the version was read from.
+        index (Optional[List[Tuple[str, str]]]): All stable version tags and SHAs of the repository, newest first.
+    """
+    version_cache[(owner, repo)] = (latest_version, latest_sha)
+    failure_cache.pop((owner, repo), None)
+    if index:
+        version_indexes[(owner, repo)] = index
+
+    if persistent_cache is None:
+        return
+
+    now: float = time.time()
+    try:
+        with persistent_cache_lock:
+            persistent_cache.execute("DELETE FROM failures WHERE owner = ? AND repo = ?", (owner, repo))
+            persistent_cache.execute(
+                "INSERT OR REPLACE INTO versions (owner, repo, tag, sha, etag, last_modified, tags, fetched_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (owner, repo, latest_version, latest_sha, etag, last_modified, json.dumps(index) if index else None, now, now)
+            )
+    except sqlite3.Error as e:
+        print(f"Error writing {owner}/{repo} to the version cache: {e}")
+
+
+def default_cache_path() -> str:
+    """
+    Build the default location of the persistent cache, honouring XDG_CACHE_HOME.
+
+    Returns:
+        str: The path to the cache database file.
+    """
+    cache_home: str = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "update-actions", "versions.sqlite3")
+
+
+def open_persistent_cache(cache_path: str, ttl: int, max_entries: int, verbose: bool, negative_ttl: int = DEFAULT_NEGATIVE_CACHE_TTL) -> None:
+    """
+    Open (creating if needed) the persistent version cache.
+
+    If the cache cannot be opened the run continues with the in-memory cache only.
+
+    Arguments:
+        cache_path (str): The path to the cache database file.
+        ttl (int): Seconds before a cached version is considered stale.
+        max_entries (int): The maximum number of actions to keep, least recently used are evicted first.
+        verbose (bool): If True, prints detailed information.
+        negative_ttl (int): Seconds before an action whose lookup failed is looked up again.
+    """
+    global persistent_cache, persistent_cache_ttl, persistent_cache_max_entries, persistent_cache_negative_ttl
+
+    try:
+        cache_dir: str = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        connection: sqlite3.Connection = sqlite3.connect(cache_path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != CACHE_SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS versions")
+            connection.execute("DROP TABLE IF EXISTS file_index")
+            connection.execute("DROP TABLE IF EXISTS failures")
+            connection.execute(f"PRAGMA user_version={CACHE_SCHEMA_VERSION}")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            "owner TEXT NOT NULL, repo TEXT NOT NULL, tag TEXT NOT NULL, sha TEXT NOT NULL, etag TEXT, last_modified TEXT, tags TEXT, "
+            "fetched_at REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (owner, repo))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS file_index ("
+            "path TEXT NOT NULL PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL, refs TEXT NOT NULL, "
+            "last_seen REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS failures ("
+            "owner TEXT NOT NULL, repo TEXT NOT NULL, reason TEXT NOT NULL, credentials TEXT, failed_at REAL NOT NULL, PRIMARY KEY (owner, repo))"
+        )
+    except (sqlite3.Error, OSError) as e:
+        print(f"Unable to open the version cache {cache_path}: {e}")
+        return
+
+    persistent_cache = connection
+    persistent_cache_ttl = ttl
+    persistent_cache_max_entries = max_entries
+    persistent_cache_negative_ttl = negative_ttl
+    if verbose:
+        print(f"Using version cache: {cache_path}")
+
+
+def close_persistent_cache() -> None:
+    """Evict the least recently used entries beyond the size limit, expired failures and files no longer scanned, and close the persistent cache."""
+    global persistent_cache
+
+    if persistent_cache is None:
+        return
+
+    try:
+        with persistent_cache_lock:
+            persistent_cache.execute(
+                "DELETE FROM versions WHERE rowid NOT IN (SELECT rowid FROM versions ORDER BY last_used DESC LIMIT ?)",
+                (max(0, persistent_cache_max_entries),)
+            )
+            persistent_cache.execute("DELETE FROM failures WHERE failed_at <= ?", (time.time() - persistent_cache_negative_ttl,))
+            persistent_cache.execute("DELETE FROM file_index WHERE last_seen <= ?", (time.time() - FILE_INDEX_MAX_AGE,))
+            persistent_cache.close()
+    except sqlite3.Error as e:
+        print(f"Error closing the version cache: {e}")
+
+    persistent_cache = None
+
+
+def load_persistent_version(owner: str, repo: str) -> Optional[Tuple[str, str]]:
+    """
+    Look up a version in the persistent cache, ignoring entries older than the configured TTL.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+
+    Returns:
+        Optional[Tuple[str, str]]: The cached version and SHA, or None if not cached or stale.
+    """
+    if persistent_cache is None:
+        return None
+
+    now: float = time.time()
+    try:
+        with persistent_cache_lock:
+            row: Optional[Tuple[str, str, float]] = persistent_cache.execute(
+                "SELECT tag, sha, fetched_at FROM versions WHERE owner = ? AND repo = ?", (owner, repo)
+            ).fetchone()
+            if row is None or now - row[2] >= persistent_cache_ttl:
+                return None
+            persistent_cache.execute("UPDATE versions SET last_used = ? WHERE owner = ? AND repo = ?", (now, owner, repo))
+    except sqlite3.Error as e:
+        print(f"Error reading {owner}/{repo} from the version cache: {e}")
+        return None
+
+    return row[0], row[1]
+
+
+def get_cache_validators(owner: str, repo: str) -> Optional[Tuple[str, str, Optional[str], Optional[str]]]:
+    """
+    Look up a persisted entry regardless of its age, together with the validators needed to revalidate it.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+
+    Returns:
+        Optional[Tuple[str, str, Optional[str], Optional[str]]]: The cached version, SHA, ETag and Last-Modified value,
+        or None if the entry is missing or has no validators.
+    """
+    if persistent_cache is None:
+        return None
+
+    try:
+        with persistent_cache_lock:
+            row: Optional[Tuple[str, str, Optional[str], Optional[str]]] = persistent_cache.execute(
+                "SELECT tag, sha, etag, last_modified FROM versions WHERE owner = ? AND repo = ?", (owner, repo)
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error reading {owner}/{repo} from the version cache: {e}")
+        return None
+
+    if row is None or not (row[2] or row[3]):
+        return None
+    return row
+
+
+def load_version_index(owner: str, repo: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    Look up the sorted version index of a repository in the persistent cache, regardless of its age.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+
+    Returns:
+        Optional[List[Tuple[str, str]]]: The stable version tags and SHAs of the repository, newest first, or None if not cached.
+    """
+    if persistent_cache is None:
+        return None
+
+    try:
+        with persistent_cache_lock:
+            row: Optional[Tuple[Optional[str]]] = persistent_cache.execute(
+                "SELECT tags FROM versions WHERE owner = ? AND repo = ?", (owner, repo)
+            ).fetchone()
+        if row is None or not row[0]:
+            return None
+        return [tuple(entry) for entry in json.loads(row[0])]
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error reading {owner}/{repo} from the version cache: {e}")
+        return None
+
+
+def refresh_persistent_version(owner: str, repo: str) -> None:
+    """
+    Mark a persisted entry as freshly fetched after GitHub confirmed it is unchanged.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+    """
+    if persistent_cache is None:
+        return
+
+    now: float = time.time()
+    try:
+        with persistent_cache_lock:
+            persistent_cache.execute("UPDATE versions SET fetched_at = ?, last_used = ? WHERE owner = ? AND repo = ?", (now, now, owner, repo))
+    except sqlite3.Error as e:
+        print(f"Error writing {owner}/{repo} to the version cache: {e}")
+
+
+def load_file_index(file_paths: Iterable[str]) -> Dict[str, Tuple[int, int, str, List[Tuple[str, str, str, str]]]]:
+    """
+    Load the fingerprints of the files about to be scanned from the persistent cache, and mark them as seen.
+
+    Only the requested paths are read, so the index of a cache shared by many folders is never loaded as a whole.
+    Files that are not seen for FILE_INDEX_MAX_AGE are removed when the cache is closed.
+
+    Arguments:
+        file_paths (Iterable[str]): The absolute paths of the files.
+
+    Returns:
+        Dict[str, Tuple[int, int, str, List[Tuple[str, str, str, str]]]]: The modification time, size, content hash and
+            (owner, repo, sha, version) references of each indexed file, keyed by absolute path.
+    """
+    if persistent_cache is None:
+        return {}
+
+    paths: List[str] = list(dict.fromkeys(file_paths))
+    index: Dict[str, Tuple[int, int, str, List[Tuple[str, str, str, str]]]] = {}
+    now: float = time.time()
+
+    try:
+        with persistent_cache_lock:
+            persistent_cache.execute("BEGIN")
+            for start in range(0, len(paths), FILE_INDEX_QUERY_SIZE):
+                chunk: List[str] = paths[start:start + FILE_INDEX_QUERY_SIZE]
+                placeholders: str = ", ".join("?" * len(chunk))
+                rows: List[Any] = persistent_cache.execute(
+                    f"SELECT path, mtime_ns, size, hash, refs FROM file_index WHERE path IN ({placeholders})", chunk  # nosec B608
+                ).fetchall()
+                persistent_cache.execute(f"UPDATE file_index SET last_seen = ? WHERE path IN ({placeholders})", [now, *chunk])  # nosec B608
+                index.update((path, (mtime_ns, size, digest, [tuple(ref) for ref in json.loads(refs)])) for path, mtime_ns, size, digest, refs in rows)
+            persistent_cache.execute("COMMIT")
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error reading the file index: {e}")
+        return {}
+
+    return index
+
+
+def store_file_index(entries: Dict[str, Tuple[int, int, str, List[Tuple[str, str, str, str]]]]) -> None:
+    """
+    Write updated file fingerprints to the persistent cache in a single transaction.
+
+    Arguments:
+        entries (Dict[str, Tuple[int, int, str, List[Tuple[str, str, str, str]]]]): The fingerprints to write, keyed by absolute path.
+    """
+    if persistent_cache is None or not entries:
+        return
+
+    now: float = time.time()
+    try:
+        with persistent_cache_lock:
+            persistent_cache.execute("BEGIN")
+            persistent_cache.executemany(
+                "INSERT OR REPLACE INTO file_index (path, mtime_ns, size, hash, refs, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, mtime_ns, size, digest, json.dumps(refs), now) for path, (mtime_ns, size, digest, refs) in entries.items()]
+            )
+            persistent_cache.execute("COMMIT")
+    except sqlite3.Error as e:
+        print(f"Error writing the file index: {e}")
+
+
+def execute_github_request(owner: str, repo: str, github_token: Optional[str], etag: Optional[str] = None, last_modified: Optional[str] = None,
+                           session: Optional[requests.Session] = None, url: Optional[str] = None) -> Optional[requests.Response]:
+    """
+    Execute the HTTP request to GitHub to fetch the latest version information.
+
+    When validators from a previous response are supplied the request is made conditional, and GitHub answers
+    with 304 Not Modified if the tags have not changed.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        etag (Optional[str]): The ETag of a previous response, sent as If-None-Match.
+        last_modified (Optional[str]): The Last-Modified value of a previous response, sent as If-Modified-Since.
+        session (Optional[requests.Session]): The HTTP session to send the request through. Defaults to the shared session.
+        url (Optional[str]): The URL of a later page of tags. Defaults to the first page.
+
+    Returns:
+        Optional[requests.Response]: The HTTP response object if the request is successful, None otherwise.
+    """
+    url = url or f"{GITHUB_TAGS_API_URL.format(owner=owner, repo=repo)}?per_page={TAGS_PER_PAGE}"
+
+    return send_github_request(
+        lambda token: (session or get_http_session()).get(url, headers=build_request_headers(token, etag, last_modified), timeout=request_timeout),
+        github_token, owner, repo, f"the request for {owner}/{repo}"
+    )
+
+
+def send_github_request(send: Callable[[Optional[str]], requests.Response], github_token: Optional[str], owner: str, repo: str,
+                        description: str, resource: str = "core") -> Optional[requests.Response]:
+    """
+    Send an API request, retrying it according to the retry policy.
+
+    Connection errors, timeouts and 5xx responses are retried after an exponential backoff. Requests refused by a
+    rate limit are retried once the pause has passed or with another token from the pool, and requests sent with a
+    rejected pooled token are retried with another token. Every attempt is paced from the rate limit budget.
+
+    Arguments:
+        send (Callable[[Optional[str]], requests.Response]): Sends the request with the given token.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        owner (str): The owner of the GitHub repository, used in messages.
+        repo (str): The name of the GitHub repository, used in messages.
+        description (str): What the request is for, used in messages.
+        resource (str): The rate limited API resource, 'core' for REST or 'graphql'.
+
+    Returns:
+        Optional[requests.Response]: The HTTP response object if the request is successful, None otherwise.
+    """
+    attempt: int = 0
+
+    while not is_past_deadline(description):
+        token: Optional[str] = acquire_github_token(github_token, resource) or github_token
+        error: str
+
+        wait_time: float = reserve_request_slot(token, resource)
+        if wait_exceeds_deadline(wait_time):
+            print(f"Not waiting {wait_time:.0f} seconds for {description}, the run deadline would be exceeded.")
+            return None
+
+        try:
+            time.sleep(wait_time)
+            response: requests.Response = send(token)
+            record_rate_limit(response.headers, token, resource)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.HTTPError as http_err:
+            if not handle_http_error(response, http_err, owner, repo, token):
+                return None
+            error = f"HTTP {response.status_code}"
+        except requests.exceptions.ConnectionError:
+            print("Network connection error. Please check your internet connection.")
+            error = "a connection error"
+        except requests.exceptions.Timeout:
+            error = "a timeout"
+        except requests.exceptions.RequestException as req_err:
+            print(f"An unexpected error occurred during {description}: {req_err}")
+            return None
+
+        delay: Optional[float] = get_retry_delay(attempt, description, error)
+        if delay is None:
+            return None
+        time.sleep(delay)
+        attempt += 1
+
+    return None
+
+
+def handle_http_error(response: requests.Response, http_err: requests.exceptions.HTTPError, owner: str, repo: str,
+                      github_token: Optional[str] = None) -> bool:
+    """
+    Handle HTTP errors that occur during the GitHub request.
+
+    Arguments:
+        response (requests.Response): The HTTP response object.
+        http_err (requests.exceptions.HTTPError): The HTTP error raised.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): The token the request was sent with.
+
+    Returns:
+        bool: True if retrying the request may succeed.
+    """
+    if response.status_code == 401:
+        handle_invalid_token(github_token)
+        return True
+    if response.status_code in (403, 429):
+        handle_rate_limit(response)
+        return not rate_limit_exceeded
+
+    print(f"HTTP error occurred for {owner}/{repo}: {http_err}")
+    if response.status_code in NEGATIVE_STATUS_CODES and response.request.method == "GET":
+        store_failure(owner, repo, f"HTTP {response.status_code}", get_credentials_id(github_token))
+    return response.status_code >= 500
+
+
+def handle_version_response(response: requests.Response, owner: str, repo: str, github_token: Optional[str] = None,
+                            session: Optional[requests.Session] = None) -> Optional[Tuple[str, str]]:
+    """
+    Handle the response from the GitHub API to extract the latest version information.
+
+    The tags endpoint is paginated and not ordered by version, so any further pages are fetched before the highest
+    stable version is picked.
+
+    Arguments:
+        response (requests.Response): The response object for the first page of tags.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        session (Optional[requests.Session]): The HTTP session to fetch further pages through. Defaults to the shared session.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails.
+    """
+    if response.status_code == 200:
+        try:
+            tags: List[Any] = list(response.json())
+            next_url: Optional[str] = get_next_page_url(response.headers.get('Link'))
+            pages: int = 1
+
+            while next_url and pages < MAX_TAG_PAGES:
+                page: Optional[requests.Response] = execute_github_request(owner, repo, github_token, session=session, url=next_url)
+                if page is None:
+                    break
+                tags.extend(page.json())
+                next_url = get_next_page_url(page.headers.get('Link'))
+                pages += 1
+
+            if next_url:
+                report_incomplete_tags(owner, repo)
+                return None
+
+            # The validators only cover the first page, and tags are not listed in version order, so a new tag can land on a
+            # later page while the first one is unchanged. They are only kept when the whole tag list fits on one page.
+            return record_version_index(owner, repo, tags, response.headers.get('ETag') if pages == 1 else None,
+                                        response.headers.get('Last-Modified') if pages == 1 else None)
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Error parsing the JSON response for {owner}/{repo}: {e}")
+            store_failure(owner, repo, "unreadable tags response")
+    return None
+
+
+def report_incomplete_tags(owner: str, repo: str) -> None:
+    """
+    Report that not every page of tags could be read, so the highest version is unknown.
+
+    The listing is neither cached nor used, like a failed request, so that a later lookup reads it again.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+    """
+    print(f"Unable to read every page of tags of {owner}/{repo}. Skipping it.")
+
+
+def get_next_page_url(link_header: Optional[str]) -> Optional[str]:
+    """
+    Extract the URL of the next page from a Link response header.
+
+    Arguments:
+        link_header (Optional[str]): The value of the Link header, if any.
+
+    Returns:
+        Optional[str]: The URL of the next page, or None if this is the last page.
+    """
+    if not link_header:
+        return None
+
+    for link in requests.utils.parse_header_links(link_header):
+        if link.get('rel') == 'next':
+            return link.get('url')
+    return None
+
+
+def build_version_index(tags: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Sort tags by semantic version, newest first, keeping only stable releases.
+
+    Each tag name is parsed once. Names that are not valid versions and pre-releases are skipped; among tags that
+    parse to the same version the first one listed wins.
+
+    Arguments:
+        tags (Iterable[Tuple[str, str]]): The tag names and their commit SHAs.
+
+    Returns:
+        List[Tuple[str, str]]: The stable version tags and SHAs, newest first.
+    """
+    parsed: List[Tuple[version.Version, str, str]] = []
+
+    for name, sha in tags:
+        try:
+            parsed_version: version.Version = version.parse(name)
+        except version.InvalidVersion:
+            continue
+        if not parsed_version.is_prerelease:
+            parsed.append((parsed_version, name, sha))
+
+    parsed.sort(key=lambda entry: entry[0], reverse=True)
+    return [(name, sha) for _, name, sha in parsed]
+
+
+def record_version_index(owner: str, repo: str, tags: Any, etag: Optional[str] = None,
+                         last_modified: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    Build the version index from a decoded tags API response, and cache the highest stable version with it.
+
+    Arguments:
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        tags (Any): The decoded JSON list of tags, across all pages.
+        etag (Optional[str]): The ETag of the first page, used to revalidate the entry later.
+        last_modified (Optional[str]): The Last-Modified header of the first page.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if there are no stable version tags,
+        which is recorded in the negative cache.
+
+    Raises:
+        KeyError: If a tag entry is missing an expected field.
+        TypeError: If the response does not have the expected structure.
+    """
+    index: List[Tuple[str, str]] = build_version_index((tag['name'], tag['commit']['sha']) for tag in tags or [])
+    if not index:
+        store_failure(owner, repo, "no stable version tags")
+        return None
+
+    store_version(owner, repo, index[0][0], index[0][1], etag, last_modified, index)
+    return index[0]
+
+
+def get_rate_limit_wait(headers: Mapping[str, str]) -> Optional[int]:
+    """
+    Work out how long to wait for the rate limit to reset, based on the rate limit headers of a response.
+
+    Arguments:
+        headers (Mapping[str, str]): The response headers.
+
+    Returns:
+        Optional[int]: The number of seconds until the limit resets if the budget is exhausted, None if it is a different limit.
+    """
+    remaining = int(headers.get('X-RateLimit-Remaining', 0))
+    reset_time = int(headers.get('X-RateLimit-Reset', 0))
+
+    if remaining == 0:
+        return max(0, reset_time - int(time.time()))
+    return None
+
+
+def record_rate_limit(headers: Mapping[str, str], github_token: Optional[str] = None, resource: str = "core") -> None:
+    """
+    Update the known rate limit budget of a token from the headers of any API response.
+
+    Responses can complete out of order, so within the same rate limit window the lowest remaining count wins.
+    A Retry-After header, sent with secondary rate limits, holds back every request until it has passed.
+
+    Arguments:
+        headers (Mapping[str, str]): The response headers.
+        github_token (Optional[str]): The token the request was sent with.
+        resource (str): The rate limited API resource, 'core' for REST or 'graphql'.
+    """
+    global rate_limit_retry_at
+
+    try:
+        remaining: Optional[int] = int(headers['X-RateLimit-Remaining']) if 'X-RateLimit-Remaining' in headers else None
+        reset: float = float(headers.get('X-RateLimit-Reset', 0))
+        retry_after: float = float(headers.get('Retry-After', 0))
+    except ValueError:
+        return
+
+    key: Tuple[Optional[str], str] = (github_token, resource)
+    with rate_limit_lock:
+        if remaining is not None:
+            if key not in rate_limit_remaining or reset > rate_limit_reset[key]:
+                rate_limit_remaining[key], rate_limit_reset[key] = remaining, reset
+            elif reset == rate_limit_reset[key]:
+                rate_limit_remaining[key] = min(rate_limit_remaining[key], remaining)
+        if retry_after > 0:
+            rate_limit_retry_at = max(rate_limit_retry_at, time.time() + retry_after)
+
+
+def reserve_request_slot(github_token: Optional[str] = None, resource: str = "core") -> float:
+    """
+    Reserve one request from a token's rate limit budget and work out when it may be sent.
+
+    Requests are not delayed while the remaining budget of the token pool covers every request the current resolve
+    still expects to send. Otherwise the token's remaining budget is spread evenly until its reset time, and once it is
+    used up requests wait for the reset, so the limit is never hit part way through a run.
+
+    Arguments:
+        github_token (Optional[str]): The token the request will be sent with.
+        resource (str): The rate limited API resource, 'core' for REST or 'graphql'.
+
+    Returns:
+        float: The number of seconds to wait before sending the request.
+    """
+    global rate_limit_demand
+
+    key: Tuple[Optional[str], str] = (github_token, resource)
+    with rate_limit_lock:
+        now: float = time.time()
+        start: float = max(now, rate_limit_retry_at)
+        remaining: Optional[int] = rate_limit_remaining.get(key)
+        reset: float = rate_limit_reset.get(key, 0)
+
+        if remaining is not None and reset > start:
+            if remaining <= 0:
+                start = reset + 1
+                if rate_limit_next_slot.get(key, 0) < start:
+                    print(f"Rate limit budget used up. Waiting {int(start - now)} seconds until reset.")
+                    rate_limit_next_slot[key] = start
+            elif rate_limit_demand > sum(max(0.0, get_token_score(token, resource, start)) for token in github_tokens or [github_token]):
+                start = max(start, rate_limit_next_slot.get(key, 0))
+                rate_limit_next_slot[key] = start + (reset - start) / remaining
+            rate_limit_remaining[key] = max(0, remaining - 1)
+
+        rate_limit_demand = max(0, rate_limit_demand - 1)
+        return start - now
+
+
+def set_rate_limit_demand(requests_expected: int) -> None:
+    """
+    Tell the scheduler how many requests are about to be sent, so it can tell whether the remaining budget needs pacing.
+
+    Arguments:
+        requests_expected (int): The number of requests expected.
+    """
+    global rate_limit_demand
+
+    with rate_limit_lock:
+        rate_limit_demand = requests_expected
+
+
+def handle_rate_limit(response: requests.Response) -> None:
+    """
+    Manage GitHub API rate-limiting by setting the global flag and optionally waiting for the reset time.
+
+    Secondary rate limits come with a Retry-After header instead; they are already applied to later requests by
+    record_rate_limit, so the run carries on after the pause. The run never waits past its deadline.
+
+    Arguments:
+        response (requests.Response): The response object containing rate limit information.
+    """
+    global rate_limit_exceeded
+    wait_time: Optional[int] = get_rate_limit_wait(response.headers)
+
+    if wait_time is not None and has_available_github_token():
+        print("Rate limit of a pooled token exceeded. Continuing with the other tokens.")
+    elif wait_time is not None and wait_exceeds_deadline(wait_time):
+        rate_limit_exceeded = True
+        print("Rate limit exceeded and the run deadline is before the reset. Skipping further API calls.")
+    elif wait_time is not None:
+        print(f"Rate limit exceeded. Waiting {wait_time} seconds until reset.")
+        time.sleep(wait_time)
+        rate_limit_exceeded = False  # Reset the flag after waiting
+    elif response.headers.get('Retry-After'):
+        print(f"Secondary rate limit reached. Pausing requests for {response.headers['Retry-After']} seconds.")
+    else:
+        rate_limit_exceeded = True
+        print("Rate limit reached. Skipping further API calls until reset.")
+
+
+def build_graphql_query(keys: List[Tuple[str, str]]) -> Tuple[str, Dict[str, str]]:
+    """
+    Build a single aliased GraphQL query that fetches the most recent tags of several repositories.
+
+    Annotated tags are peeled so that the commit SHA is returned rather than the SHA of the tag object.
+
+    Arguments:
+        keys (List[Tuple[str, str]]): The (owner, repo) pairs to include in the query.
+
+    Returns:
+        Tuple[str, Dict[str, str]]: The query text and its variables.
+    """
+    declarations: List[str] = []
+    fields: List[str] = []
+    variables: Dict[str, str] = {}
+
+    for index, (owner, repo) in enumerate(keys):
+        declarations.append(f"$owner{index}: String!, $name{index}: String!")
+        fields.append(
+            f"r{index}: repository(owner: $owner{index}, name: $name{index}) {{ "
+            f"refs(refPrefix: \"refs/tags/\", first: {TAGS_PER_PAGE}, orderBy: {{field: TAG_COMMIT_DATE, direction: DESC}}) {{ "
+            "nodes { name target { oid ... on Tag { target { oid } } } } } }"
+        )
+        variables[f"owner{index}"] = owner
+        variables[f"name{index}"] = repo
+
+    return f"query({', '.join(declarations)}) {{ {' '.join(fields)} }}", variables
+
+
+def execute_graphql_request(query: str, variables: Dict[str, str], github_token: str,
+                            session: Optional[requests.Session] = None) -> Optional[Dict[str, Any]]:
+    """
+    Execute a GraphQL query against the GitHub API.
+
+    Arguments:
+        query (str): The GraphQL query text.
+        variables (Dict[str, str]): The variables referenced by the query.
+        github_token (str): GitHub personal access token, the GraphQL API does not allow anonymous requests.
+        session (Optional[requests.Session]): The HTTP session to send the request through. Defaults to the shared session.
+
+    Returns:
+        Optional[Dict[str, Any]]: The decoded response body if the request is successful, None otherwise.
+    """
+    response: Optional[requests.Response] = send_github_request(
+        lambda token: (session or get_http_session()).post(
+            GITHUB_GRAPHQL_API_URL, json={"query": query, "variables": variables}, headers={"Authorization": f"bearer {token}"}, timeout=request_timeout
+        ),
+        github_token, "graphql", "query", "the GraphQL request", "graphql"
+    )
+    if response is None:
+        return None
+
+    try:
+        body: Dict[str, Any] = response.json()
+    except ValueError as e:
+        print(f"An unexpected error occurred during the GraphQL request: {e}")
+        return None
+
+    if any(error.get("type") == "RATE_LIMITED" for error in body.get("errors") or []):
+        handle_rate_limit(response)
+        return None
+    return body
+
+
+def handle_graphql_response(body: Dict[str, Any], keys: List[Tuple[str, str]],
+                            github_token: Optional[str] = None) -> Dict[Tuple[str, str], Optional[Tuple[str, str]]]:
+    """
+    Extract the latest version of each repository from a batched GraphQL response and cache it.
+
+    Arguments:
+        body (Dict[str, Any]): The decoded GraphQL response.
+        keys (List[Tuple[str, str]]): The (owner, repo) pairs in the order they were added to the query.
+        github_token (Optional[str]): The token the query was sent with.
+
+    Returns:
+        Dict[Tuple[str, str], Optional[Tuple[str, str]]]: The latest version tag and SHA for each pair, or None if it has no tags.
+    """
+    data: Dict[str, Any] = body.get("data") or {}
+    results: Dict[Tuple[str, str], Optional[Tuple[str, str]]] = {}
+
+    for index, (owner, repo) in enumerate(keys):
+        results[(owner, repo)] = None
+        if f"r{index}" in data and data[f"r{index}"] is None:
+            store_failure(owner, repo, "repository not found", get_credentials_id(github_token))
+            continue
+        try:
+            nodes: List[Dict[str, Any]] = (data.get(f"r{index}") or {}).get("refs", {}).get("nodes") or []
+            version_index: List[Tuple[str, str]] = build_version_index(
+                (node["name"], node["target"]["target"]["oid"] if "target" in node["target"] else node["target"]["oid"]) for node in nodes
+            )
+            if version_index:
+                store_version(owner, repo, version_index[0][0], version_index[0][1], index=version_index)
+                results[(owner, repo)] = version_index[0]
+            elif f"r{index}" in data:
+                store_failure(owner, repo, "no stable version tags")
+        except (AttributeError, KeyError, TypeError) as e:
+            print(f"Error parsing the GraphQL response for {owner}/{repo}: {e}")
+            store_failure(owner, repo, "unreadable tags response")
+
+    return results
+
+
+def resolve_actions_graphql(references: Iterable[Tuple[str, str]], github_token: str, verbose: bool, max_workers: int = DEFAULT_MAX_WORKERS,
+                            session: Optional[requests.Session] = None) -> Dict[Tuple[str, str], Optional[Tuple[str, str]]]:
+    """
+    Resolve the latest version of many actions using batched GraphQL queries.
+
+    Cached actions are served from the cache, the rest are split into batches of GRAPHQL_BATCH_SIZE repositories per query.
+
+    Arguments:
+        references (Iterable[Tuple[str, str]]): The (owner, repo) pairs to resolve, batched in the order given.
+        github_token (str): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+        max_workers (int): The maximum number of queries to run at the same time.
+        session (Optional[requests.Session]): The HTTP session shared by all queries. Defaults to the shared session.
+
+    Returns:
+        Dict[Tuple[str, str], Optional[Tuple[str, str]]]: The latest version tag and SHA for each pair, or None if it could not be resolved.
+    """
+    results: Dict[Tuple[str, str], Optional[Tuple[str, str]]] = {}
+    pending: List[Tuple[str, str]] = []
+
+    for key in dict.fromkeys(references):
+        results[key] = get_cached_version(*key)
+        if results[key] is None and not is_cached_failure(*key, github_token, verbose):
+            pending.append(key)
+
+    batches: List[List[Tuple[str, str]]] = [pending[i:i + GRAPHQL_BATCH_SIZE] for i in range(0, len(pending), GRAPHQL_BATCH_SIZE)]
+    set_rate_limit_demand(len(batches))
+    if verbose and batches:
+        print(f"Resolving {len(pending)} actions with {len(batches)} GraphQL queries.")
+
+    def resolve_batch(batch: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Tuple[str, str]]]:
+        if check_rate_limit(verbose):
+            return {}
+        body: Optional[Dict[str, Any]] = execute_graphql_request(*build_graphql_query(batch), github_token, session)
+        return handle_graphql_response(body, batch, github_token) if body is not None else {}
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            for batch_results in executor.map(resolve_batch, batches):
+                results.update(batch_results)
+
+    return results
+
+
+async def async_get_latest_version(http: Any, owner: str, repo: str, github_token: Optional[str], verbose: bool,
+                                   semaphore: asyncio.Semaphore) -> Optional[Tuple[str, str]]:
+    """
+    Fetch the latest version tag and corresponding SHA for a given GitHub repo without blocking the event loop.
+
+    Concurrent calls for the same repository on the same event loop share a single lookup task.
+
+    Arguments:
+        http (aiohttp.ClientSession): The aiohttp session to send requests through.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+        semaphore (asyncio.Semaphore): Limits the number of requests in flight at the same time.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails or is rate-limited.
+    """
+    # The caches and mirrors are read from SQLite and git, which would block the event loop
+    cached_result: Optional[Tuple[str, str]] = await asyncio.to_thread(get_cached_version, owner, repo)
+    if cached_result or await asyncio.to_thread(is_cached_failure, owner, repo, github_token, verbose):
+        return cached_result
+    if offline_mode:
+        return await asyncio.to_thread(get_offline_version, owner, repo, verbose)
+
+    def forget_task(done: asyncio.Task) -> None:
+        if async_inflight_requests.get((owner, repo)) is done:
+            del async_inflight_requests[(owner, repo)]
+
+    task: Optional[asyncio.Task] = async_inflight_requests.get((owner, repo))
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(async_fetch_latest_version(http, owner, repo, github_token, verbose, semaphore))
+        async_inflight_requests[(owner, repo)] = task
+        task.add_done_callback(forget_task)
+
+    return await asyncio.shield(task)
+
+
+async def async_fetch_latest_version(http: Any, owner: str, repo: str, github_token: Optional[str], verbose: bool,
+                                     semaphore: asyncio.Semaphore) -> Optional[Tuple[str, str]]:
+    """
+    Look up the latest version tag and corresponding SHA for a given GitHub repo from the API, using aiohttp.
+
+    Arguments:
+        http (aiohttp.ClientSession): The aiohttp session to send requests through.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+        semaphore (asyncio.Semaphore): Limits the number of requests in flight at the same time.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails or is rate-limited.
+    """
+    # The semaphore is held until every page of tags has been fetched, so later pages are bounded by it too
+    async with semaphore:
+        if check_rate_limit(verbose):
+            return None
+
+        stale_entry: Optional[Tuple[str, str, Optional[str], Optional[str]]] = await asyncio.to_thread(get_cache_validators, owner, repo)
+        result: Optional[Tuple[int, Mapping[str, str], Any]] = await async_execute_github_request(
+            http, owner, repo, github_token, stale_entry[2] if stale_entry else None, stale_entry[3] if stale_entry else None
+        )
+
+        if result is None:
+            return None
+        if result[0] == 304 and stale_entry:
+            if verbose:
+                print(f"Cached version of {owner}/{repo} is still current.")
+            await asyncio.to_thread(refresh_persistent_version, owner, repo)
+            version_cache[(owner, repo)] = (stale_entry[0], stale_entry[1])
+            return stale_entry[0], stale_entry[1]
+        return await async_handle_version_response(http, result, owner, repo, github_token)
+
+
+async def async_execute_github_request(http: Any, owner: str, repo: str, github_token: Optional[str], etag: Optional[str] = None,
+                                       last_modified: Optional[str] = None, url: Optional[str] = None) -> Optional[Tuple[int, Mapping[str, str], Any]]:
+    """
+    Execute the HTTP request to GitHub to fetch the latest version information, using aiohttp.
+
+    Failed requests are retried like in send_github_request, waiting without blocking the event loop.
+
+    Arguments:
+        http (aiohttp.ClientSession): The aiohttp session to send the request through.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        etag (Optional[str]): The ETag of a previous response, sent as If-None-Match.
+        last_modified (Optional[str]): The Last-Modified value of a previous response, sent as If-Modified-Since.
+        url (Optional[str]): The URL of a later page of tags. Defaults to the first page.
+
+    Returns:
+        Optional[Tuple[int, Mapping[str, str], Any]]: The status code, headers and decoded body if the request is successful, None otherwise.
+    """
+    url = url or f"{GITHUB_TAGS_API_URL.format(owner=owner, repo=repo)}?per_page={TAGS_PER_PAGE}"
+    description: str = f"the request for {owner}/{repo}"
+    attempt: int = 0
+
+    while not is_past_deadline(description):
+        token: Optional[str] = acquire_github_token(github_token)
+        error: str
+
+        wait_time: float = reserve_request_slot(token)
+        if wait_exceeds_deadline(wait_time):
+            print(f"Not waiting {wait_time:.0f} seconds for {description}, the run deadline would be exceeded.")
+            return None
+
+        try:
+            await asyncio.sleep(wait_time)
+            async with http.get(url, headers=build_request_headers(token, etag, last_modified)) as response:
+                record_rate_limit(response.headers, token)
+                if response.status < 400:
+                    return response.status, response.headers, await response.json(content_type=None) if response.status == 200 else None
+                if not await async_handle_http_error(response, owner, repo, token):
+                    return None
+                error = f"HTTP {response.status}"
+        except asyncio.TimeoutError:
+            error = "a timeout"
+        except aiohttp.ClientConnectionError:
+            print("Network connection error. Please check your internet connection.")
+            error = "a connection error"
+        except (aiohttp.ClientError, ValueError) as req_err:
+            print(f"An unexpected error occurred during {description}: {req_err}")
+            return None
+
+        delay: Optional[float] = get_retry_delay(attempt, description, error)
+        if delay is None:
+            return None
+        await asyncio.sleep(delay)
+        attempt += 1
+
+    return None
+
+
+async def async_handle_http_error(response: Any, owner: str, repo: str, github_token: Optional[str]) -> bool:
+    """
+    Handle HTTP errors of a request made with aiohttp, like handle_http_error.
+
+    Arguments:
+        response (aiohttp.ClientResponse): The HTTP response object.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): The token the request was sent with.
+
+    Returns:
+        bool: True if retrying the request may succeed.
+
+    Raises:
+        InvalidTokenError: If GitHub rejects the token and there is no other token to use.
+    """
+    if response.status == 401:
+        if not discard_invalid_token(github_token):
+            raise InvalidTokenError("Invalid GitHub token. Please provide a valid token and try again.")
+        return True
+    if response.status in (403, 429):
+        await async_handle_rate_limit(response.headers)
+        return not rate_limit_exceeded
+
+    print(f"HTTP error occurred for {owner}/{repo}: {response.status} {response.reason}")
+    if response.status in NEGATIVE_STATUS_CODES:
+        await asyncio.to_thread(store_failure, owner, repo, f"HTTP {response.status}", get_credentials_id(github_token))
+    return response.status >= 500
+
+
+async def async_handle_version_response(http: Any, result: Tuple[int, Mapping[str, str], Any], owner: str, repo: str,
+                                        github_token: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Handle a response fetched with aiohttp to extract the latest version information, fetching any further pages of tags.
+
+    Arguments:
+        http (aiohttp.ClientSession): The aiohttp session to fetch further pages through.
+        result (Tuple[int, Mapping[str, str], Any]): The status code, headers and decoded body of the first page.
+        owner (str): The owner of the GitHub repository.
+        repo (str): The name of the GitHub repository.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+
+    Returns:
+        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails.
+    """
+    status, headers, body = result
+    if status == 200:
+        try:
+            tags: List[Any] = list(body)
+            next_url: Optional[str] = get_next_page_url(headers.get('Link'))
+            pages: int = 1
+
+            while next_url and pages < MAX_TAG_PAGES:
+                page: Optional[Tuple[int, Mapping[str, str], Any]] = await async_execute_github_request(http, owner, repo, github_token, url=next_url)
+                if page is None:
+                    break
+                tags.extend(page[2])
+                next_url = get_next_page_url(page[1].get('Link'))
+                pages += 1
+
+            if next_url:
+                report_incomplete_tags(owner, repo)
+                return None
+
+            return await asyncio.to_thread(record_version_index, owner, repo, tags, headers.get('ETag') if pages == 1 else None,
+                                           headers.get('Last-Modified') if pages == 1 else None)
+        except (KeyError, TypeError) as e:
+            print(f"Error parsing the JSON response for {owner}/{repo}: {e}")
+            await asyncio.to_thread(store_failure, owner, repo, "unreadable tags response")
+    return None
+
+
+async def async_handle_rate_limit(headers: Mapping[str, str]) -> None:
+    """
+    Manage GitHub API rate-limiting like handle_rate_limit, but wait without blocking the event loop.
+
+    Arguments:
+        headers (Mapping[str, str]): The headers of the response containing rate limit information.
+    """
+    global rate_limit_exceeded
+    wait_time: Optional[int] = get_rate_limit_wait(headers)
+
+    if wait_time is not None and has_available_github_token():
+        print("Rate limit of a pooled token exceeded. Continuing with the other tokens.")
+    elif wait_time is not None and wait_exceeds_deadline(wait_time):
+        rate_limit_exceeded = True
+        print("Rate limit exceeded and the run deadline is before the reset. Skipping further API calls.")
+    elif wait_time is not None:
+        print(f"Rate limit exceeded. Waiting {wait_time} seconds until reset.")
+        await asyncio.sleep(wait_time)
+        rate_limit_exceeded = False  # Reset the flag after waiting
+    elif headers.get('Retry-After'):
+        print(f"Secondary rate limit reached. Pausing requests for {headers['Retry-After']} seconds.")
+    else:
+        rate_limit_exceeded = True
+        print("Rate limit reached. Skipping further API calls until reset.")
+
+
+async def async_resolve_actions(references: Iterable[Tuple[str, str]], github_token: Optional[str], verbose: bool,
+                                concurrency: int = DEFAULT_MAX_WORKERS) -> Dict[Tuple[str, str], Optional[Tuple[str, str]]]:
+    """
+    Resolve the latest version of every referenced action concurrently on the running event loop.
+
+    This is the entry point for embedding the resolver into an asyncio application; it requires aiohttp.
+
+    Arguments:
+        references (Iterable[Tuple[str, str]]): The (owner, repo) pairs to resolve.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+        concurrency (int): The maximum number of requests in flight at the same time.
+
+    Returns:
+        Dict[Tuple[str, str], Optional[Tuple[str, str]]]: The latest version tag and SHA for each pair, or None if it could not be resolved.
+
+    Raises:
+        RuntimeError: If aiohttp is not installed.
+        InvalidTokenError: If GitHub rejects the token and there is no other token to use.
+    """
+    if aiohttp is None:
+        raise RuntimeError("The asyncio engine requires the aiohttp package.")
+
+    keys: List[Tuple[str, str]] = list(dict.fromkeys(references))
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(max(1, concurrency))
+    connector: Any = aiohttp.TCPConnector(limit=max(1, concurrency))
+    timeout: Any = aiohttp.ClientTimeout(total=request_timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"Accept": "application/vnd.github+json"}) as http:
+        results: List[Optional[Tuple[str, str]]] = await asyncio.gather(
+            *(async_get_latest_version(http, owner, repo, github_token, verbose, semaphore) for owner, repo in keys)
+        )
+
+    return dict(zip(keys, results))
+
+
+def update_action_version(file_path: str, github_token: Optional[str], dry_run: bool, backup: bool, stats: Dict[str, int], verbose: bool,
+                          resolved: Optional[Dict[Tuple[str, str], Optional[Tuple[str, str]]]] = None, scan_mode: str = "buffer",
+                          mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> None:
+    """
+    Update the GitHub action versions in a specific file if newer versions are available.
+
+    Arguments:
+        file_path (str): The path to the file to be updated.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, only prints changes without modifying the files.
+        backup (bool): If True, creates a backup before modifying the file.
+        stats (Dict[str, int]): A dictionary for tracking the number of files and changes made.
+        verbose (bool): If True, prints detailed information.
+        resolved (Optional[Dict]): Pre-resolved latest versions keyed by (owner, repo). If None, versions are looked up on demand.
+        scan_mode (str): 'buffer' to scan the whole file in one pass, or 'lines' to process it line by line.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped and skipped without being read if they have no match.
+    """
+    try:
+        updated_lines: List[str]
+        changes_made: int
+
+        if not file_may_reference_actions(file_path, mmap_threshold):
+            return
+
+        with open(file_path, 'r', encoding='utf-8') as file:
+            if scan_mode == "lines":
+                updated_lines, changes_made = process_lines(file, github_token, dry_run, verbose, resolved)
+            else:
+                updated_lines, changes_made = process_buffer(file.read(), github_token, dry_run, verbose, resolved)
+
+        finalize_update(file_path, updated_lines, changes_made > 0, changes_made, dry_run, backup, stats, verbose)
+
+    except (IOError, OSError) as e:
+        print(f"Error processing file {file_path}: {e}")
+
+
+def process_lines(lines: Iterable[str], github_token: Optional[str], dry_run: bool, verbose: bool,
+                  resolved: Optional[Dict[Tuple[str, str], Optional[Tuple[str, str]]]] = None) -> Tuple[List[str], int]:
+    """
+    Check and potentially update every line of a file.
+
+    Arguments:
+        lines (Iterable[str]): The lines of the file being processed.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, only prints changes without modifying the lines.
+        verbose (bool): If True, prints detailed information.
+        resolved (Optional[Dict]): Pre-resolved latest versions keyed by (owner, repo). If None, versions are looked up on demand.
+
+    Returns:
+        Tuple[List[str], int]: The potentially updated lines, and the number of updates made.
+    """
+    updated_lines: List[str] = []
+    changes_made: int = 0
+    updated_line: str
+    was_changed: bool
+
+    for line in lines:
+        updated_line, was_changed = process_line(line, github_token, dry_run, verbose, resolved)
+        updated_lines.append(updated_line)
+        if was_changed:
+            changes_made += 1
+
+    return updated_lines, changes_made
+
+
+def process_buffer(content: str, github_token: Optional[str], dry_run: bool, verbose: bool,
+                   resolved: Optional[Dict[Tuple[str, str], Optional[Tuple[str, str]]]] = None) -> Tuple[List[str], int]:
+    """
+    Check and potentially update a whole file in a single pass over its contents.
+
+    The updates are collected as (start, end, replacement) spans, and the output is only built when there is at least one.
+
+    Arguments:
+        content (str): The full contents of the file being processed.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, only prints changes without building the updated contents.
+        verbose (bool): If True, prints detailed information.
+        resolved (Optional[Dict]): Pre-resolved latest versions keyed by (owner, repo). If None, versions are looked up on demand.
+
+    Returns:
+        Tuple[List[str], int]: The potentially updated contents as a single-element list, and the number of updates made.
+    """
+    edits: List[Tuple[int, int, str]] = find_file_edits(content, github_token, dry_run, verbose, resolved)
+    if not edits or dry_run:
+        return [content], len(edits)
+    return [apply_edits(content, edits)], len(edits)
+
+
+def find_file_edits(content: str, github_token: Optional[str], dry_run: bool, verbose: bool,
+                    resolved: Optional[Dict[Tuple[str, str], Optional[Tuple[str, str]]]] = None) -> List[Tuple[int, int, str]]:
+    """
+    Find every pinned action reference in a file's contents that has a newer version.
+
+    Arguments:
+        content (str): The full contents of the file.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, prints the changes that would be made.
+        verbose (bool): If True, prints detailed information.
+        resolved (Optional[Dict]): Pre-resolved latest versions keyed by (owner, repo). If None, versions are looked up on demand.
+
+    Returns:
+        List[Tuple[int, int, str]]: The (start, end, replacement) edits, in file order.
+    """
+    if ACTION_REFERENCE_PREFILTER not in content:
+        return []
+
+    edits: List[Tuple[int, int, str]] = []
+    for match in ACTION_REFERENCE_PATTERN.finditer(content):
+        latest: Optional[Tuple[str, str]] = check_reference_update(match, github_token, dry_run, verbose, resolved)
+        if latest:
+            edits.append(get_reference_replacement(content, match, *latest))
+    return edits
+
+
+def apply_edits(content: str, edits: List[Tuple[int, int, str]]) -> str:
+    """
+    Apply non-overlapping (start, end, replacement) edits to a string.
+
+    Arguments:
+        content (str): The original text.
+        edits (List[Tuple[int, int, str]]): The edits, sorted by start offset.
+
+    Returns:
+        str: The edited text.
+    """
+    pieces: List[str] = []
+    position: int = 0
+
+    for start, end, replacement in edits:
+        pieces.append(content[position:start])
+        pieces.append(replacement)
+        position = end
+
+    pieces.append(content[position:])
+    return "".join(pieces)
+
+
+def get_available_update(latest: Optional[Tuple[str, str]], current_version: str) -> Optional[Tuple[str, str]]:
+    """
+    Compare a reference's current version with the latest version of its action.
+
+    Arguments:
+        latest (Optional[Tuple[str, str]]): The latest version tag and SHA of the action, or None if unknown.
+        current_version (str): The version the reference is currently pinned to.
+
+    Returns:
+        Optional[Tuple[str, str]]: The SHA and version (without a 'v' prefix) to update to, or None if the reference is up to date.
+    """
+    latest_version: str | Any
+    latest_sha: str | Any
+
+    latest_version, latest_sha = latest or (None, None)
+
+    # Normalize the latest_version to ensure it does not include a 'v' prefix (case-insensitive)
+    if latest_version and latest_version.lower().startswith('v'):
+        latest_version = latest_version[1:]
+
+    # Update only if there is a newer version available
+    if latest_version and latest_sha and version.parse(latest_version) > version.parse(current_version):
+        return latest_sha, latest_version
+
+    return None
+
+
+def process_line(line: str, github_token: Optional[str], dry_run: bool, verbose: bool,
+                 resolved: Optional[Dict[Tuple[str, str], Optional[Tuple[str, str]]]] = None) -> Tuple[str, bool]:
+    """
+    Check and potentially updates a line in the file that references a GitHub action.
+
+    Arguments:
+        line (str): A single line from the file being processed.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, only prints changes without modifying the line.
+        verbose (bool): If True, prints detailed information.
+        resolved (Optional[Dict]): Pre-resolved latest versions keyed by (owner, repo). If None, versions are looked up on demand.
+
+    Returns:
+        Tuple[str, bool]: The potentially updated line, and a boolean indicating whether an update was made.
+    """
+    match: re.Match[str] | None = match_action_reference(line)
+    if not match:
+        return line, False
+
+    latest: Optional[Tuple[str, str]] = check_reference_update(match, github_token, dry_run, verbose, resolved)
+    if not latest:
+        return line, False
+
+    if not dry_run:
+        start, end, replacement = get_reference_replacement(line, match, *latest)
+        line = line[:start] + replacement + line[end:]
+    return line, True
+
+
+def check_reference_update(match: re.Match, github_token: Optional[str], dry_run: bool, verbose: bool,
+                           resolved: Optional[Dict[Tuple[str, str], Optional[Tuple[str, str]]]] = None) -> Optional[Tuple[str, str]]:
+    """
+    Check whether a matched action reference has a newer version available.
+
+    Arguments:
+        match (re.Match): The matched action reference.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, prints the change that would be made.
+        verbose (bool): If True, prints detailed information.
+        resolved (Optional[Dict]): Pre-resolved latest versions keyed by (owner, repo). If None, versions are looked up on demand.
+
+    Returns:
+        Optional[Tuple[str, str]]: The SHA and version (without a 'v' prefix) to update to, or None if the reference is up to date.
+    """
+    owner: str | Any
+    repo: str | Any
+    current_sha: str | Any
+    current_version: str | Any
+    latest: Optional[Tuple[str, str]]
+
+    owner, repo, current_sha, current_version = match.group('owner', 'repo', 'sha', 'version')
+    if resolved is not None:
+        latest = resolved.get((owner, repo))
+    else:
+        latest = get_latest_version(owner, repo, github_token, verbose)
+
+    update: Optional[Tuple[str, str]] = get_available_update(latest, current_version)
+    if update:
+        if verbose:
+            print(f"Found update for {owner}/{repo}: {current_version} -> {update[1]}")
+        if dry_run:
+            print(f"[Dry Run] Would update {current_sha} -> {update[0]} with version v{update[1]}")
+
+    return update
+
+
+def match_action_reference(line: str) -> Optional[re.Match]:
+    """
+    Find a pinned action reference in a line.
+
+    Lines without 'uses:' are rejected with a substring check, so the regex engine only runs on candidate lines.
+
+    Arguments:
+        line (str): A single line from the file being processed.
+
+    Returns:
+        Optional[re.Match]: The match, or None if the line does not reference a pinned action.
+    """
+    if ACTION_REFERENCE_PREFILTER not in line:
+        return None
+    return ACTION_REFERENCE_PATTERN.search(line)
+
+
+def get_reference_replacement(text: str, match: re.Match, latest_sha: str, latest_version: str) -> Tuple[int, int, str]:
+    """
+    Build the edit that pins a matched action reference to a new SHA and version.
+
+    The edit covers the span from the SHA to the end of the version comment, keeping the whitespace in between, so it
+    can be applied with a single splice.
+
+    Arguments:
+        text (str): The text the match was found in.
+        match (re.Match): The matched action reference.
+        latest_sha (str): The commit SHA to pin.
+        latest_version (str): The version to write in the comment, without a 'v' prefix.
+
+    Returns:
+        Tuple[int, int, str]: The start and end offsets of the span to replace, and its replacement.
+    """
+    # Ensure the version comment has a single 'v' prefix
+    replacement: str = f"{latest_sha}{text[match.end('sha'):match.start('comment')]}# v{latest_version}"
+    return match.start('sha'), match.end('comment'), replacement
+
+
+def finalize_update(file_path: str, updated_lines: List[str], changed: bool, changes_made: int, dry_run: bool,
+                    backup: bool, stats: Dict[str, int], verbose: bool) -> None:
+    """
+    Finalize the file update process, creating a backup if specified, and updating statistics.
+
+    Arguments:
+        file_path (str): The path to the file that was potentially updated.
+        updated_lines (List[str]): The list of lines, updated if necessary.
+        changed (bool): Indicates if any changes were made to the file.
+        changes_made (int): The number of changes made in the file.
+        dry_run (bool): If True, does not actually write changes to the file.
+        backup (bool): If True, creates a backup before modifying the file.
+        stats (Dict[str, int]): Dictionary to update with stats about files and changes.
+        verbose (bool): If True, prints detailed information.
+    """
+    if changed:
+        stats['files_updated'] += 1
+        stats['total_changes'] += changes_made
+
+        if not dry_run:
+            if backup:
+                create_backup(file_path, verbose)
+            try:
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.writelines(updated_lines)
+                    if verbose:
+                        print(f"Updated file: {file_path}")
+            except (IOError, OSError) as e:
+                print(f"Error writing updated file {file_path}: {e}")
+
+
+def create_backup(file_path: str, verbose: bool) -> None:
+    """
+    Create a backup of the specified file.
+
+    Arguments:
+        file_path (str): The path to the file for which to create a backup.
+        verbose (bool): If True, prints detailed information.
+    """
+    try:
+        backup_dir: str = os.path.join(os.path.dirname(file_path), BACKUP_DIRECTORY)
+        os.makedirs(backup_dir, exist_ok=True)
+        backup_file_path: str = os.path.join(backup_dir, os.path.basename(file_path))
+        shutil.copyfile(file_path, backup_file_path)
+        if verbose:
+            print(f"Backup created: {backup_file_path}")
+    except (IOError, OSError) as e:
+        print(f"Error creating backup for {file_path}: {e}")
+
 
-# Global cache and rate-limiting flag
-version_cache: Dict[Tuple[str, str], Tuple[str, str]] = {}
-rate_limit_exceeded = False  # Flag to stop further requests if API rate limit is hit
+def find_action_files(folder_path: str, extensions: List[str], recursive: bool, discovery: str = "walk", excludes: Optional[List[str]] = None,
+                      includes: Optional[List[str]] = None, workflows_only: bool = False) -> List[str]:
+    """
+    Find all files with a matching extension within the specified folder.
 
+    Arguments:
+        folder_path (str): The root directory to search for action files.
+        extensions (List[str]): List of file extensions to include.
+        recursive (bool): If True, recursively searches subdirectories.
+        discovery (str): 'walk' to list every file on disk, or 'git' to only list files tracked by git, falling back to 'walk'
+            if the folder is not in a git work tree.
+        excludes (Optional[List[str]]): Glob patterns of files and directories to skip, matched against names and relative paths.
+        includes (Optional[List[str]]): Glob patterns files must match, if given.
+        workflows_only (bool): If True, only searches the .github/workflows directory of the folder.
 
-def main() -> None:
-    """Parse command-line arguments and initiates the action updating process."""
-    parser = argparse.ArgumentParser(description="Update GitHub Actions in a folder to the latest version.")
-    parser.add_argument("--path", default=".", help="Path to the folder containing GitHub Actions files. Default is current directory.")
-    parser.add_argument("--github-token", help="GitHub personal access token for authenticated requests.")
-    parser.add_argument("--dry-run", action="store_true", help="Print changes without modifying files.")
-    parser.add_argument("--backup", action="store_true", help="Create a backup of each file before updating.")
-    parser.add_argument("--extensions", default="yml,yaml", help="Comma-separated list of file extensions to check. Default is 'yml,yaml'.")
-    parser.add_argument("--recursive", action="store_true", help="Recursively search for files in subdirectories.")
-    parser.add_argument("--verbose", action="store_true", help="Print detailed information about the update process.")
+    Returns:
+        List[str]: The matching file paths, in a stable sorted order.
+    """
+    excludes = [BACKUP_DIRECTORY, *(excludes or [])]
+    includes = includes or []
 
-    args: argparse.Namespace = parser.parse_args()
+    if workflows_only:
+        folder_path = os.path.join(folder_path, WORKFLOWS_DIRECTORY)
 
-    # Split extensions argument by comma and add dot prefix
-    extensions: List[str] = [f".{ext.strip()}" for ext in args.extensions.split(",")]
+    if discovery == "git":
+        tracked_paths: Optional[List[str]] = find_tracked_files(folder_path, extensions, recursive, excludes, includes)
+        if tracked_paths is not None:
+            return tracked_paths
+        print(f"Unable to list the files tracked by git in {folder_path}, walking the directory instead.")
 
-    update_all_actions(
-        folder_path=args.path,
-        github_token=args.github_token,
-        dry_run=args.dry_run,
-        backup=args.backup,
-        extensions=extensions,
-        recursive=args.recursive,
-        verbose=args.verbose
-    )
+    return walk_action_files(folder_path, extensions, recursive, excludes, includes)
 
 
-def get_latest_version(owner: str, repo: str, github_token: Optional[str], verbose: bool) -> Optional[Tuple[str, str]]:
+def walk_action_files(folder_path: str, extensions: List[str], recursive: bool, excludes: List[str], includes: List[str]) -> List[str]:
     """
-    Fetch the latest version tag and corresponding SHA for a given GitHub repo.
+    Walk a directory tree with os.scandir and collect the files with a matching extension.
+
+    Excluded directories are pruned before they are opened, and the file type cached by scandir is used so that most
+    entries never need a separate stat call. Files are returned in the same order as a sorted top-down os.walk.
 
     Arguments:
-        owner (str): The owner of the GitHub repository.
-        repo (str): The name of the GitHub repository.
-        github_token (Optional[str]): GitHub personal access token for authenticated requests.
-        verbose (bool): If True, prints detailed information.
+        folder_path (str): The root directory to search for action files.
+        extensions (List[str]): List of file extensions to include.
+        recursive (bool): If True, recursively searches subdirectories.
+        excludes (List[str]): Glob patterns of files and directories to skip.
+        includes (List[str]): Glob patterns files must match, if not empty.
 
     Returns:
-        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails or is rate-limited.
+        List[str]: The matching file paths.
     """
-    if check_rate_limit(verbose):
-        return None
+    suffixes: Tuple[str, ...] = tuple(extensions)
+    file_paths: List[str] = []
+    pending: List[Tuple[str, str]] = [(folder_path, "")]
 
-    cached_result: Tuple[str] | None = get_cached_version(owner, repo)
-    if cached_result:
-        return cached_result
+    while pending:
+        directory, relative_directory = pending.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries: List[os.DirEntry] = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            continue
 
-    response: requests.Response | None = execute_github_request(owner, repo, github_token)
-    if response:
-        return handle_version_response(response, owner, repo)
+        subdirectories: List[Tuple[str, str]] = []
+        for entry in entries:
+            relative_path: str = relative_directory + entry.name
+            if matches_patterns(entry.name, relative_path, excludes):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirectories.append((entry.path, relative_path + "/"))
+            elif entry.name.endswith(suffixes) and entry.is_file() and (not includes or matches_patterns(entry.name, relative_path, includes)):
+                file_paths.append(entry.path)
 
-    return None
+        # Visit subdirectories depth first, in sorted order
+        pending.extend(reversed(subdirectories))
 
+    return file_paths
 
-def check_rate_limit(verbose: bool) -> bool:
+
+def matches_patterns(name: str, relative_path: str, patterns: List[str]) -> bool:
     """
-    Check the global rate limit flag.
+    Check whether a file or directory matches any glob pattern, by name or by its path relative to the search root.
 
     Arguments:
-        verbose (bool): If True, prints detailed information.
+        name (str): The file or directory name.
+        relative_path (str): The path relative to the search root, with '/' separators.
+        patterns (List[str]): The glob patterns.
 
     Returns:
-        bool: True if the rate limit flag is set, False otherwise.
+        bool: True if any pattern matches.
     """
-    if rate_limit_exceeded:
-        if verbose:
-            print("Skipping API request due to rate limit.")
-        return True
-    return False
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern) for pattern in patterns)
 
 
-def get_cached_version(owner: str, repo: str) -> Optional[Tuple[str, str]]:
+def find_tracked_files(folder_path: str, extensions: List[str], recursive: bool, excludes: Optional[List[str]] = None,
+                       includes: Optional[List[str]] = None) -> Optional[List[str]]:
     """
-    Check if the latest version is available in the cache.
+    Find the files with a matching extension that are tracked by git within the specified folder.
+
+    The list comes from the git index, so ignored and untracked files (node_modules, build output, ...) are never visited.
 
     Arguments:
-        owner (str): The owner of the GitHub repository.
-        repo (str): The name of the GitHub repository.
+        folder_path (str): The root directory to search for action files, anywhere inside a git work tree.
+        extensions (List[str]): List of file extensions to include.
+        recursive (bool): If True, includes files in subdirectories.
+        excludes (Optional[List[str]]): Glob patterns of files and directories to skip.
+        includes (Optional[List[str]]): Glob patterns files must match, if given.
 
     Returns:
-        Optional[Tuple[str, str]]: The cached version and SHA, or None if not cached.
+        Optional[List[str]]: The matching file paths in sorted order, or None if git is unavailable or the folder is not in a work tree.
+    """
+    git: Optional[str] = shutil.which("git")
+    if git is None:
+        return None
+
+    pathspecs: List[str] = [f"*{ext}" for ext in extensions]
+    try:
+        result: subprocess.CompletedProcess = subprocess.run(  # nosec B603
+            [git, "-C", folder_path, "ls-files", "-z", "--cached", "--", *pathspecs], capture_output=True, check=True
+        )
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+    file_paths: List[str] = []
+    for relative_path in sorted(os.fsdecode(path) for path in result.stdout.split(b"\0") if path):
+        parts: List[str] = relative_path.split("/")
+        if not recursive and len(parts) > 1:
+            continue
+        if any(matches_patterns(part, "/".join(parts[:depth + 1]), excludes or []) for depth, part in enumerate(parts)):
+            continue
+        if includes and not matches_patterns(parts[-1], relative_path, includes):
+            continue
+        file_path: str = os.path.join(folder_path, *parts)
+        # Tracked files deleted from the work tree are still listed in the index
+        if os.path.isfile(file_path):
+            file_paths.append(file_path)
+
+    return file_paths
+
+
+def file_may_reference_actions(file_path: str, mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> bool:
+    """
+    Check whether a large file contains any pinned action reference without reading it into memory.
+
+    Files of at least mmap_threshold bytes are memory mapped and searched as bytes, so a file without a match is never decoded
+    or copied into a Python string. Smaller files are not checked and always return True.
+
+    Arguments:
+        file_path (str): The path to the file to check.
+        mmap_threshold (int): The size in bytes from which files are memory mapped. 0 disables the check.
+
+    Returns:
+        bool: False if the file is known to contain no action reference, True otherwise.
     """
-    return version_cache.get((owner, repo))
+    if mmap_threshold <= 0 or os.path.getsize(file_path) < mmap_threshold:
+        return True
 
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return ACTION_REFERENCE_BYTES_PATTERN.search(mapped) is not None
 
-def execute_github_request(owner: str, repo: str, github_token: Optional[str]) -> Optional[requests.Response]:
+
+def scan_file_for_actions(file_path: str, mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Set[Tuple[str, str]]:
     """
-    Execute the HTTP request to GitHub to fetch the latest version information.
+    Collect the unique (owner, repo) pairs referenced by pinned actions in a file.
 
     Arguments:
-        owner (str): The owner of the GitHub repository.
-        repo (str): The name of the GitHub repository.
-        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        file_path (str): The path to the file to scan.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped and skipped without being read if they have no match.
 
     Returns:
-        Optional[requests.Response]: The HTTP response object if the request is successful, None otherwise.
+        Set[Tuple[str, str]]: The (owner, repo) pairs found in the file.
     """
-    url: str = GITHUB_TAGS_API_URL.format(owner=owner, repo=repo)
-    headers: Dict[str, str] = {"Authorization": f"token {github_token}"} if github_token else {}
+    references: Set[Tuple[str, str]] = set()
 
     try:
-        response: requests.Response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        return response
-    except requests.exceptions.HTTPError as http_err:
-        handle_http_error(response, http_err, owner, repo)
-    except requests.exceptions.ConnectionError:
-        print("Network connection error. Please check your internet connection.")
-    except requests.exceptions.Timeout:
-        print(f"Request for {owner}/{repo} timed out. Retrying may be necessary.")
-    except requests.exceptions.RequestException as req_err:
-        print(f"An unexpected error occurred during the request for {owner}/{repo}: {req_err}")
+        if not file_may_reference_actions(file_path, mmap_threshold):
+            return references
 
-    return None
+        with open(file_path, 'r', encoding='utf-8') as file:
+            content: str = file.read()
+        if ACTION_REFERENCE_PREFILTER in content:
+            references.update(match.group('owner', 'repo') for match in ACTION_REFERENCE_PATTERN.finditer(content))
+    except (IOError, OSError) as e:
+        print(f"Error scanning file {file_path}: {e}")
 
+    return references
 
-def handle_http_error(response: requests.Response, http_err: requests.exceptions.HTTPError, owner: str, repo: str) -> None:
+
+def collect_action_references(file_paths: Iterable[str], jobs: int = 1,
+                              mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Dict[Tuple[str, str], int]:
     """
-    Handle HTTP errors that occur during the GitHub request.
+    Scan all files and collect the unique (owner, repo) pairs they reference, with the number of files referencing each.
 
     Arguments:
-        response (requests.Response): The HTTP response object.
-        http_err (requests.exceptions.HTTPError): The HTTP error raised.
-        owner (str): The owner of the GitHub repository.
-        repo (str): The name of the GitHub repository.
+        file_paths (Iterable[str]): The files to scan.
+        jobs (int): The number of worker processes to scan with. 1 scans in the current process.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped and skipped without being read if they have no match.
+
+    Returns:
+        Dict[Tuple[str, str], int]: The number of files referencing each unique (owner, repo) pair.
     """
-    if response.status_code == 401:
-        print("Invalid GitHub token. Please provide a valid token and try again.")
-        sys.exit(1)
-    elif response.status_code == 403:
-        handle_rate_limit(response)
+    file_paths = list(file_paths)
+    scan = partial(scan_file_for_actions, mmap_threshold=mmap_threshold)
+    references: Dict[Tuple[str, str], int] = Counter()
+
+    if jobs > 1 and len(file_paths) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for file_references in executor.map(scan, file_paths, chunksize=get_chunk_size(len(file_paths), jobs)):
+                references.update(file_references)
     else:
-        print(f"HTTP error occurred for {owner}/{repo}: {http_err}")
+        for file_path in file_paths:
+            references.update(scan(file_path))
+
+    return references
 
 
-def handle_version_response(response: requests.Response, owner: str, repo: str) -> Optional[Tuple[str, str]]:
+def fingerprint_file(file_path: str, indexed: Optional[Tuple[int, int, str, List[Tuple[str, str, str, str]]]] = None,
+                     mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Optional[Tuple[int, int, str, List[Tuple[str, str, str, str]]]]:
     """
-    Handle the response from the GitHub API to extract the latest version information.
+    Fingerprint a file and extract its pinned action references.
+
+    If the content hash matches the previously indexed entry, for example because the file was only touched, the indexed
+    references are reused and the file is not decoded or matched again.
 
     Arguments:
-        response (requests.Response): The response object from the GitHub API.
-        owner (str): The owner of the GitHub repository.
-        repo (str): The name of the GitHub repository.
+        file_path (str): The path to the file.
+        indexed (Optional[Tuple[int, int, str, List[Tuple[str, str, str, str]]]]): The previous index entry for the file, if any.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped instead of being read.
 
     Returns:
-        Optional[Tuple[str, str]]: The latest version tag and its commit SHA, or None if the request fails.
+        Optional[Tuple[int, int, str, List[Tuple[str, str, str, str]]]]: The modification time, size, content hash and
+            (owner, repo, sha, version) references of the file, or None if it could not be read.
     """
-    if response.status_code == 200:
-        try:
-            tags: Any = response.json()
-            if tags:
-                latest_version: Any = tags[0]['name']
-                latest_sha: Any = tags[0]['commit']['sha']
-                version_cache[(owner, repo)] = (latest_version, latest_sha)
-                return latest_version, latest_sha
-        except (ValueError, KeyError) as e:
-            print(f"Error parsing the JSON response for {owner}/{repo}: {e}")
-    return None
+    content: str = ""
+
+    try:
+        stat: os.stat_result = os.stat(file_path)
+        with open(file_path, 'rb') as file:
+            if 0 < mmap_threshold <= stat.st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest: str = hashlib.sha256(mapped).hexdigest()
+                    if (not indexed or indexed[2] != digest) and ACTION_REFERENCE_BYTES_PATTERN.search(mapped):
+                        content = mapped[:].decode('utf-8')
+            else:
+                data: bytes = file.read()
+                digest = hashlib.sha256(data).hexdigest()
+                if not indexed or indexed[2] != digest:
+                    content = data.decode('utf-8')
+    except (IOError, OSError) as e:
+        print(f"Error scanning file {file_path}: {e}")
+        return None
 
+    if indexed and indexed[2] == digest:
+        return stat.st_mtime_ns, stat.st_size, digest, indexed[3]
 
-def handle_rate_limit(response: requests.Response) -> None:
+    references: List[Tuple[str, str, str, str]] = []
+    if ACTION_REFERENCE_PREFILTER in content:
+        references = [match.group('owner', 'repo', 'sha', 'version') for match in ACTION_REFERENCE_PATTERN.finditer(content)]
+    return stat.st_mtime_ns, stat.st_size, digest, references
+
+
+def collect_indexed_references(file_paths: Iterable[str], jobs: int = 1,
+                               mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Dict[str, List[Tuple[str, str, str, str]]]:
     """
-    Manage GitHub API rate-limiting by setting the global flag and optionally waiting for the reset time.
+    Collect the pinned action references of each file, only scanning files that changed since they were last indexed.
+
+    A file is considered unchanged when its modification time and size match the file index in the persistent cache.
+    The index is updated with every file that had to be scanned.
 
     Arguments:
-        response (requests.Response): The response object containing rate limit information.
+        file_paths (Iterable[str]): The files to scan.
+        jobs (int): The number of worker processes to scan changed files with. 1 scans in the current process.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped instead of being read.
+
+    Returns:
+        Dict[str, List[Tuple[str, str, str, str]]]: The (owner, repo, sha, version) references of each readable file.
     """
-    global rate_limit_exceeded
-    remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-    reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
+    file_paths = list(file_paths)
+    index: Dict[str, Tuple[int, int, str, List[Tuple[str, str, str, str]]]] = load_file_index(os.path.abspath(path) for path in file_paths)
+    file_references: Dict[str, List[Tuple[str, str, str, str]]] = {}
+    changed: List[str] = []
 
-    if remaining == 0:
-        wait_time: int = max(0, reset_time - int(time.time()))
-        print(f"Rate limit exceeded. Waiting {wait_time} seconds until reset.")
-        time.sleep(wait_time)
-        rate_limit_exceeded = False  # Reset the flag after waiting
+    for file_path in file_paths:
+        entry: Optional[Tuple[int, int, str, List[Tuple[str, str, str, str]]]] = index.get(os.path.abspath(file_path))
+        try:
+            stat: os.stat_result = os.stat(file_path)
+        except OSError as e:
+            print(f"Error scanning file {file_path}: {e}")
+            continue
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            file_references[file_path] = entry[3]
+        else:
+            changed.append(file_path)
+
+    entries: List[Optional[Tuple[int, int, str, List[Tuple[str, str, str, str]]]]]
+    previous: List[Optional[Tuple[int, int, str, List[Tuple[str, str, str, str]]]]] = [index.get(os.path.abspath(path)) for path in changed]
+    if jobs > 1 and len(changed) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            entries = list(executor.map(partial(fingerprint_file, mmap_threshold=mmap_threshold), changed, previous,
+                                        chunksize=get_chunk_size(len(changed), jobs)))
     else:
-        rate_limit_exceeded = True
-        print("Rate limit reached. Skipping further API calls until reset.")
+        entries = [fingerprint_file(path, entry, mmap_threshold) for path, entry in zip(changed, previous)]
+
+    updated: Dict[str, Tuple[int, int, str, List[Tuple[str, str, str, str]]]] = {}
+    for file_path, fingerprint in zip(changed, entries):
+        if fingerprint:
+            file_references[file_path] = fingerprint[3]
+            updated[os.path.abspath(file_path)] = fingerprint
+    store_file_index(updated)
+
+    return file_references
 
 
-def update_action_version(file_path: str, github_token: Optional[str], dry_run: bool, backup: bool, stats: Dict[str, int], verbose: bool) -> None:
+def get_chunk_size(count: int, jobs: int) -> int:
     """
-    Update the GitHub action versions in a specific file if newer versions are available.
+    Pick how many files to hand to a worker process at a time, balancing scheduling overhead against an even spread.
 
     Arguments:
-        file_path (str): The path to the file to be updated.
-        github_token (Optional[str]): GitHub personal access token for authenticated requests.
-        dry_run (bool): If True, only prints changes without modifying the files.
-        backup (bool): If True, creates a backup before modifying the file.
-        stats (Dict[str, int]): A dictionary for tracking the number of files and changes made.
-        verbose (bool): If True, prints detailed information.
+        count (int): The total number of files.
+        jobs (int): The number of worker processes.
+
+    Returns:
+        int: The number of files per chunk.
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines: List[str] = file.readlines()
+    return max(1, count // (jobs * 4))
+
 
-        updated_lines: List = []
-        changed: bool = False
-        changes_made: int = 0
-        updated_line: str
-        was_changed: bool
+def resolve_actions(references: Iterable[Tuple[str, str]], github_token: Optional[str], verbose: bool, max_workers: int = DEFAULT_MAX_WORKERS,
+                    session: Optional[requests.Session] = None, resolver: str = "rest",
+                    engine: str = "threads") -> Dict[Tuple[str, str], Optional[Tuple[str, str]]]:
+    """
+    Resolve the latest version of every referenced action concurrently using a bounded worker pool.
 
-        for line in lines:
-            updated_line, was_changed = process_line(line, github_token, dry_run, verbose)
-            updated_lines.append(updated_line)
-            if was_changed:
-                changed = True
-                changes_made += 1
+    If references maps each pair to the number of files referencing it, the most referenced actions are resolved first,
+    so that they are the least likely to be held back by the rate limit.
 
-        finalize_update(file_path, updated_lines, changed, changes_made, dry_run, backup, stats, verbose)
+    Arguments:
+        references (Iterable[Tuple[str, str]]): The (owner, repo) pairs to resolve, or a mapping of them to their reference counts.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        verbose (bool): If True, prints detailed information.
+        max_workers (int): The maximum number of lookups to run at the same time.
+        session (Optional[requests.Session]): The HTTP session shared by all lookups. Defaults to the shared session.
+        resolver (str): The API used to look up versions, either 'rest' or 'graphql'.
+        engine (str): How REST lookups run concurrently, either 'threads' or 'asyncio'.
 
-    except (IOError, OSError) as e:
-        print(f"Error processing file {file_path}: {e}")
+    Returns:
+        Dict[Tuple[str, str], Optional[Tuple[str, str]]]: The latest version tag and SHA for each pair, or None if it could not be resolved.
+    """
+    keys: List[Tuple[str, str]] = sorted(set(references))
+    if not keys:
+        return {}
+    if isinstance(references, Mapping):
+        keys.sort(key=lambda key: references[key], reverse=True)
+
+    if offline_mode:
+        return {key: get_latest_version(key[0], key[1], github_token, verbose) for key in keys}
+    if cache_url:
+        # The cache server looks the actions up, so they are requested from it one by one
+        resolver, engine = "rest", "threads"
+
+    if resolver == "graphql":
+        if github_token:
+            return resolve_actions_graphql(keys, github_token, verbose, max_workers, session)
+        print("The GraphQL API requires a GitHub token. Falling back to the REST API.")
+
+    set_rate_limit_demand(sum(1 for key in keys if get_cached_version(*key) is None and get_cached_failure(*key, github_token) is None))
+
+    if engine == "asyncio":
+        if aiohttp is not None:
+            try:
+                return asyncio.run(async_resolve_actions(keys, github_token, verbose, max_workers))
+            except InvalidTokenError as e:
+                print(e)
+                sys.exit(1)
+        print("The asyncio engine requires the aiohttp package. Falling back to threads.")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys)))) as executor:
+        results: List[Optional[Tuple[str, str]]] = list(executor.map(lambda key: get_latest_version(key[0], key[1], github_token, verbose, session), keys))
 
+    return dict(zip(keys, results))
 
-def process_line(line: str, github_token: Optional[str], dry_run: bool, verbose: bool) -> Tuple[str, bool]:
+
+def rewrite_action_files(file_paths: Iterable[str], resolved: Dict[Tuple[str, str], Optional[Tuple[str, str]]], github_token: Optional[str],
+                         dry_run: bool, backup: bool, verbose: bool, jobs: int = 1, scan_mode: str = "buffer",
+                         mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Dict[str, int]:
     """
-    Check and potentially updates a line in the file that references a GitHub action.
+    Rewrite each file using the resolved latest versions.
 
     Arguments:
-        line (str): A single line from the file being processed.
+        file_paths (Iterable[str]): The files to update.
+        resolved (Dict[Tuple[str, str], Optional[Tuple[str, str]]]): The latest version tag and SHA for each (owner, repo) pair.
         github_token (Optional[str]): GitHub personal access token for authenticated requests.
-        dry_run (bool): If True, only prints changes without modifying the line.
+        dry_run (bool): If True, only prints changes without modifying files.
+        backup (bool): If True, creates a backup before updating.
         verbose (bool): If True, prints detailed information.
+        jobs (int): The number of worker processes to rewrite with. 1 rewrites in the current process.
+        scan_mode (str): 'buffer' to scan each file in one pass, or 'lines' to process it line by line.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped and skipped without being read if they have no match.
 
     Returns:
-        Tuple[str, bool]: The potentially updated line, and a boolean indicating whether an update was made.
+        Dict[str, int]: Stats about total files, updated files, and changes made.
     """
-    owner: str | Any
-    repo: str | Any
-    current_sha: str | Any
-    current_version: str | Any
-    latest_version: str | Any
-    latest_sha: str | Any
+    stats: Dict[str, int] = {'total_files': 0, 'files_updated': 0, 'total_changes': 0}
 
-    match: re.Match[str] | None = re.search(r'uses:\s+([\w-]+)/([\w-]+)@([a-f0-9]+)\s+#\s*v?([\d.]+)', line)
-    if not match:
-        return line, False
+    for _, file_stats in rewrite_each_action_file(file_paths, resolved, github_token, dry_run, backup, verbose, jobs, scan_mode, mmap_threshold):
+        merge_stats(stats, file_stats)
 
-    owner, repo, current_sha, current_version = match.groups()
-    latest_version, latest_sha = get_latest_version(owner, repo, github_token, verbose)
+    return stats
 
-    # Normalize the latest_version to ensure it does not include a 'v' prefix (case-insensitive)
-    if latest_version and latest_version.lower().startswith('v'):
-        latest_version = latest_version[1:]
 
-    # Update only if there is a newer version available
-    if latest_version and latest_sha and version.parse(latest_version) > version.parse(current_version):
-        if verbose:
-            print(f"Found update for {owner}/{repo}: {current_version} -> {latest_version}")
-        if dry_run:
-            print(f"[Dry Run] Would update {current_sha} -> {latest_sha} with version v{latest_version}")
-        else:
-            # Replace the hash and ensure the version comment has a single 'v' prefix
-            line = re.sub(r'@([a-f0-9]+)', f'@{latest_sha}', line)
-            line = re.sub(r'#\s*v?[\d.]+', f'# v{latest_version}', line)
-        return line, True
+def rewrite_each_action_file(file_paths: Iterable[str], resolved: Dict[Tuple[str, str], Optional[Tuple[str, str]]], github_token: Optional[str],
+                             dry_run: bool, backup: bool, verbose: bool, jobs: int = 1, scan_mode: str = "buffer",
+                             mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Iterator[Tuple[str, Dict[str, int]]]:
+    """
+    Rewrite each file using the resolved latest versions, yielding the stats of every file as it completes.
+
+    Arguments:
+        file_paths (Iterable[str]): The files to update.
+        resolved (Dict[Tuple[str, str], Optional[Tuple[str, str]]]): The latest version tag and SHA for each (owner, repo) pair.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, only prints changes without modifying files.
+        backup (bool): If True, creates a backup before updating.
+        verbose (bool): If True, prints detailed information.
+        jobs (int): The number of worker processes to rewrite with. 1 rewrites in the current process.
+        scan_mode (str): 'buffer' to scan each file in one pass, or 'lines' to process it line by line.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped and skipped without being read if they have no match.
 
-    return line, False
+    Returns:
+        Iterator[Tuple[str, Dict[str, int]]]: Each file path with its stats, in the order of file_paths.
+    """
+    file_paths = list(file_paths)
+    rewrite = partial(rewrite_action_file, resolved=resolved, github_token=github_token, dry_run=dry_run, backup=backup, verbose=verbose,
+                      scan_mode=scan_mode, mmap_threshold=mmap_threshold)
+
+    if jobs > 1 and len(file_paths) > 1:
+        # Each worker returns its own stats, which are only combined by the caller, so no state is shared between processes
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from zip(file_paths, executor.map(rewrite, file_paths, chunksize=get_chunk_size(len(file_paths), jobs)))
+    else:
+        for file_path in file_paths:
+            yield file_path, rewrite(file_path)
 
 
-def finalize_update(file_path: str, updated_lines: List[str], changed: bool, changes_made: int, dry_run: bool,
-                    backup: bool, stats: Dict[str, int], verbose: bool) -> None:
+def rewrite_action_file(file_path: str, resolved: Dict[Tuple[str, str], Optional[Tuple[str, str]]], github_token: Optional[str],
+                        dry_run: bool, backup: bool, verbose: bool, scan_mode: str = "buffer",
+                        mmap_threshold: int = DEFAULT_MMAP_THRESHOLD) -> Dict[str, int]:
     """
-    Finalize the file update process, creating a backup if specified, and updating statistics.
+    Rewrite a single file using the resolved latest versions, collecting stats for that file only.
 
     Arguments:
-        file_path (str): The path to the file that was potentially updated.
-        updated_lines (List[str]): The list of lines, updated if necessary.
-        changed (bool): Indicates if any changes were made to the file.
-        changes_made (int): The number of changes made in the file.
-        dry_run (bool): If True, does not actually write changes to the file.
-        backup (bool): If True, creates a backup before modifying the file.
-        stats (Dict[str, int]): Dictionary to update with stats about files and changes.
+        file_path (str): The file to update.
+        resolved (Dict[Tuple[str, str], Optional[Tuple[str, str]]]): The latest version tag and SHA for each (owner, repo) pair.
+        github_token (Optional[str]): GitHub personal access token for authenticated requests.
+        dry_run (bool): If True, only prints changes without modifying the file.
+        backup (bool): If True, creates a backup before updating.
         verbose (bool): If True, prints detailed information.
+        scan_mode (str): 'buffer' to scan the file in one pass, or 'lines' to process it line by line.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped and skipped without being read if they have no match.
+
+    Returns:
+        Dict[str, int]: Stats about the file, with total_files set to 1.
     """
-    if changed:
-        stats['files_updated'] += 1
-        stats['total_changes'] += changes_made
+    stats: Dict[str, int] = {'total_files': 1, 'files_updated': 0, 'total_changes': 0}
+    if verbose:
+        print(f"Checking file: {file_path}")
+    update_action_version(file_path, github_token, dry_run, backup, stats, verbose, resolved, scan_mode, mmap_threshold)
+    return stats
 
-        if not dry_run:
-            if backup:
-                create_backup(file_path, verbose)
-            try:
-                with open(file_path, 'w', encoding='utf-8') as file:
-                    file.writelines(updated_lines)
-                    if verbose:
-                        print(f"Updated file: {file_path}")
-            except (IOError, OSError) as e:
-                print(f"Error writing updated file {file_path}: {e}")
 
+def merge_stats(stats: Dict[str, int], other: Dict[str, int]) -> None:
+    """
+    Add the counts of one stats dictionary to another.
+
+    Arguments:
+        stats (Dict[str, int]): The stats to add to, updated in place.
+        other (Dict[str, int]): The stats to add.
+    """
+    for key, value in other.items():
+        stats[key] = stats.get(key, 0) + value
 
-def create_backup(file_path: str, verbose: bool) -> None:
+
+def find_fleet_action_files(folder_paths: List[str], extensions: List[str], recursive: bool, discovery: str = "walk",
+                            excludes: Optional[List[str]] = None, includes: Optional[List[str]] = None, workflows_only: bool = False) -> Dict[str, str]:
     """
-    Create a backup of the specified file.
+    Find the action files of several root folders, keeping track of the root each file belongs to.
 
     Arguments:
-        file_path (str): The path to the file for which to create a backup.
-        verbose (bool): If True, prints detailed information.
+        folder_paths (List[str]): The root directories to search for action files.
+        extensions (List[str]): List of file extensions to include.
+        recursive (bool): If True, recursively searches subdirectories.
+        discovery (str): 'walk' to search every file on disk, or 'git' to only search files tracked by git.
+        excludes (Optional[List[str]]): Glob patterns of files and directories to skip.
+        includes (Optional[List[str]]): Glob patterns files must match, if given.
+        workflows_only (bool): If True, only searches the .github/workflows directory of each folder.
+
+    Returns:
+        Dict[str, str]: The root folder of each file, in discovery order.
     """
-    try:
-        backup_dir: str = os.path.join(os.path.dirname(file_path), "backups")
-        os.makedirs(backup_dir, exist_ok=True)
-        backup_file_path: str = os.path.join(backup_dir, os.path.basename(file_path))
-        shutil.copyfile(file_path, backup_file_path)
-        if verbose:
-            print(f"Backup created: {backup_file_path}")
-    except (IOError, OSError) as e:
-        print(f"Error creating backup for {file_path}: {e}")
+    file_roots: Dict[str, str] = {}
+    seen: Set[str] = set()
 
+    for root in folder_paths:
+        for file_path in find_action_files(root, extensions, recursive, discovery, excludes, includes, workflows_only):
+            # Overlapping roots must not update the same file twice
+            if os.path.abspath(file_path) not in seen:
+                seen.add(os.path.abspath(file_path))
+                file_roots[file_path] = root
 
-def update_all_actions(folder_path: str, github_token: Optional[str], dry_run: bool, backup: bool, extensions: List[str],
-                       recursive: bool, verbose: bool) -> None:
+    return file_roots
+
+
+def update_all_actions(folder_path: Union[str, List[str]], github_token: Optional[str], dry_run: bool,  # pylint: disable=too-many-locals
+                       backup: bool, extensions: List[str], recursive: bool, verbose: bool, max_workers: int = DEFAULT_MAX_WORKERS,
+                       session: Optional[requests.Session] = None, resolver: str = "rest", engine: str = "threads", jobs: int = 1, scan_mode: str = "buffer",
+                       mmap_threshold: int = DEFAULT_MMAP_THRESHOLD, incremental: bool = False, discovery: str = "walk",
+                       excludes: Optional[List[str]] = None, includes: Optional[List[str]] = None,
+                       workflows_only: bool = False) -> Dict[str, Dict[str, int]]:
     """
     Orchestrate the process of updating GitHub actions in all files within the specified folder and its subdirectories.
 
+    The update runs in three phases: all files are scanned to collect the unique set of referenced actions, that set is
+    resolved concurrently against the GitHub API, and finally each file is rewritten from the resolved versions.
+
+    When several folders are given, for example one checkout per repository, the files of all of them are scanned and
+    resolved together, so every action is looked up once for the whole fleet, and a summary is printed per folder.
+
     Arguments:
-        folder_path (str): The root directory to search for action files.
+        folder_path (Union[str, List[str]]): The root directory to search for action files, or a list of root directories.
         github_token (Optional[str]): GitHub personal access token for authenticated requests.
         dry_run (bool): If True, only prints changes without modifying files.
         backup (bool): If True, creates a backup before updating.
         extensions (List[str]): List of file extensions to include.
         recursive (bool): If True, recursively searches subdirectories.
         verbose (bool): If True, prints detailed information.
+        max_workers (int): The maximum number of concurrent GitHub API lookups.
+        session (Optional[requests.Session]): The HTTP session used for all GitHub API requests. Defaults to the shared session.
+        resolver (str): The API used to look up versions, either 'rest' or 'graphql'.
+        engine (str): How REST lookups run concurrently, either 'threads' or 'asyncio'.
+        jobs (int): The number of worker processes used to scan and rewrite files.
+        scan_mode (str): 'buffer' to scan each file in one pass, or 'lines' to process it line by line.
+        mmap_threshold (int): Files of at least this many bytes are memory mapped and skipped without being read if they have no match.
+        incremental (bool): If True, files unchanged since the last run are not scanned, and files whose references are all up to date
+            are not rewritten. Requires the persistent cache.
+        discovery (str): 'walk' to search every file on disk, or 'git' to only search files tracked by git.
+        excludes (Optional[List[str]]): Glob patterns of files and directories to skip.
+        includes (Optional[List[str]]): Glob patterns files must match, if given.
+        workflows_only (bool): If True, only searches the .github/workflows directory of the folder.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Stats about total files, updated files, and changes made, keyed by root directory.
     """
-    stats: Dict[str, int] = {'total_files': 0, 'files_updated': 0, 'total_changes': 0}
+    folder_paths: List[str] = [folder_path] if isinstance(folder_path, str) else list(folder_path)
+    file_roots: Dict[str, str] = find_fleet_action_files(folder_paths, extensions, recursive, discovery, excludes, includes, workflows_only)
+    file_paths: List[str] = list(file_roots)
+    file_references: Optional[Dict[str, List[Tuple[str, str, str, str]]]] = None
+    references: Dict[Tuple[str, str], int]
+
+    if incremental and persistent_cache is None:
+        print("The persistent cache is disabled, scanning all files.")
+    elif incremental:
+        file_references = collect_indexed_references(file_paths, jobs, mmap_threshold)
+
+    if file_references is not None:
+        references = Counter(key for refs in file_references.values() for key in {(owner, repo) for owner, repo, _, _ in refs})
+    else:
+        references = collect_action_references(file_paths, jobs, mmap_threshold)
+    if verbose:
+        print(f"Found {len(references)} unique actions in {len(file_paths)} files.")
+
+    resolved: Dict[Tuple[str, str], Optional[Tuple[str, str]]] = resolve_actions(references, github_token, verbose, max_workers, session, resolver, engine)
+
+    # With the index, only files that reference an outdated action need to be read again
+    outdated: List[str] = file_paths
+    if file_references is not None:
+        outdated = [file_path for file_path, refs in file_references.items()
+                    if any(get_available_update(resolved.get((owner, repo)), current_version) for owner, repo, _, current_version in refs)]
+        if verbose:
+            print(f"{len(outdated)} of {len(file_paths)} files reference an outdated action.")
 
-    for root, dirs, files in os.walk(folder_path):
-        dirs[:] = sorted([d for d in dirs if d != "backups"])
-        if not recursive:
-            dirs.clear()
+    root_stats: Dict[str, Dict[str, int]] = {root: {'total_files': 0, 'files_updated': 0, 'total_changes': 0} for root in folder_paths}
+    for file_path, file_stats in rewrite_each_action_file(outdated, resolved, github_token, dry_run, backup, verbose, jobs, scan_mode, mmap_threshold):
+        merge_stats(root_stats[file_roots[file_path]], file_stats)
+    for file_path in set(file_paths).difference(outdated):
+        root_stats[file_roots[file_path]]['total_files'] += 1
 
-        for filename in sorted(files):
-            if any(filename.endswith(ext) for ext in extensions):
-                file_path: str = os.path.join(root, filename)
-                if verbose:
-                    print(f"Checking file: {file_path}")
-                stats['total_files'] += 1
-                update_action_version(file_path, github_token, dry_run, backup, stats, verbose)
+    stats: Dict[str, int] = {'total_files': 0, 'files_updated': 0, 'total_changes': 0}
+    for other in root_stats.values():
+        merge_stats(stats, other)
 
+    if len(root_stats) > 1:
+        print_root_summary(root_stats)
     print_summary(stats)
 
+    return root_stats
+
 
 def print_summary(stats: Dict[str, int]) -> None:
     """
@@ -420,5 +3651,19 @@ def print_summary(stats: Dict[str, int]) -> None:
     ], headers=["Statistic", "Count"], tablefmt="grid"))
 
 
+def print_root_summary(root_stats: Dict[str, Dict[str, int]]) -> None:
+    """
+    Print the number of files scanned, updated, and changes made in each folder of a multi-folder run.
+
+    Arguments:
+        root_stats (Dict[str, Dict[str, int]]): Stats about total files, updated files, and changes made, keyed by folder.
+    """
+    print("\nRepository Statistics")
+    print(tabulate(
+        [[root, stats['total_files'], stats['files_updated'], stats['total_changes']] for root, stats in root_stats.items()],
+        headers=["Repository", "Files Scanned", "Files Updated", "Changes Made"], tablefmt="grid"
+    ))
+
+
 if __name__ == "__main__":
     main()
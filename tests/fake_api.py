@@ -0,0 +1,44 @@
+"""Shared set-up for tests that run the updater against the benchmark's fake GitHub API."""
+
+import os
+import sys
+import threading
+import unittest
+from typing import Type
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import benchmark  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+import update  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+
+GITHUB_API_URL: str = update.GITHUB_API_URL
+
+
+class FakeApiTestCase(unittest.TestCase):
+    """Run the updater against a fake GitHub API started once per test class, from empty caches and with no retries."""
+
+    tag_count: int = 10
+    latency: float = 0.0
+    handler: Type[benchmark.FakeGitHubHandler] = benchmark.FakeGitHubHandler
+    server: benchmark.FakeGitHubServer
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Start the fake API and point the updater at it."""
+        cls.server = benchmark.FakeGitHubServer(cls.tag_count, cls.latency, None)
+        cls.server.RequestHandlerClass = cls.handler
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        update.set_api_url(cls.server.url)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Stop the fake API."""
+        cls.server.shutdown()
+        cls.server.server_close()
+        update.set_api_url(GITHUB_API_URL)
+
+    def setUp(self) -> None:
+        """Start from empty caches with no retries."""
+        benchmark.reset_update_state()
+        update.set_retry_policy(0, 0.0, 5.0)
+        self.addCleanup(update.set_retry_policy)
@@ -0,0 +1,79 @@
+"""Tests for the asyncio lookup engine."""
+
+import asyncio
+import threading
+import unittest
+from typing import Any, List
+
+from fake_api import FakeApiTestCase, benchmark, update
+
+TAG_COUNT: int = 300  # Three pages per repository
+LATENCY: float = 0.1
+
+
+class RejectingHandler(benchmark.FakeGitHubHandler):
+    """Serve tags like the fake API, but reject the token 'bad-token'."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve a page of the tags endpoint, or a 401 for the rejected token."""
+        if self.headers.get("Authorization", "").endswith("bad-token"):
+            self.send_json(401, {"message": "Bad credentials"})
+            return
+        super().do_GET()
+
+
+@unittest.skipIf(update.aiohttp is None, "aiohttp is not installed")
+class AsyncEngineTest(FakeApiTestCase):
+    """Check that the asyncio engine can be embedded in an application's event loop."""
+
+    tag_count = TAG_COUNT
+    latency = LATENCY
+    handler = RejectingHandler
+
+    def test_pages_are_bounded_by_the_concurrency_limit(self) -> None:
+        """Later pages of tags wait for the concurrency limit rather than queueing up behind the request timeout."""
+        in_flight: List[int] = [0, 0]  # Current and highest number of requests
+        execute = update.async_execute_github_request
+
+        async def count_requests(*args: Any, **kwargs: Any) -> Any:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            try:
+                return await execute(*args, **kwargs)
+            finally:
+                in_flight[0] -= 1
+
+        keys: List[Any] = [("o", f"r{index}") for index in range(8)]
+        update.async_execute_github_request = count_requests
+        try:
+            results = asyncio.run(update.async_resolve_actions(keys, None, False, concurrency=2))
+        finally:
+            update.async_execute_github_request = execute
+        self.assertTrue(all(results[key] for key in keys))
+        self.assertLessEqual(in_flight[1], 2)
+
+    def test_rejected_token_raises(self) -> None:
+        """A rejected token raises an exception in the host's event loop instead of exiting the process."""
+        with self.assertRaises(update.InvalidTokenError):
+            asyncio.run(update.async_resolve_actions([("o", "r")], "bad-token", False))
+
+    def test_cache_is_read_off_the_event_loop(self) -> None:
+        """Cache lookups, which may run SQLite queries and git, do not run on the event loop's thread."""
+        threads: List[threading.Thread] = []
+        get_cached_version = update.get_cached_version
+
+        def record_thread(owner: str, repo: str) -> Any:
+            threads.append(threading.current_thread())
+            return get_cached_version(owner, repo)
+
+        update.get_cached_version = record_thread
+        try:
+            asyncio.run(update.async_resolve_actions([("o", "r")], None, False))
+        finally:
+            update.get_cached_version = get_cached_version
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
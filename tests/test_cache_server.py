@@ -0,0 +1,136 @@
+"""Tests for the shared cache server and runs pointed at it."""
+
+import json
+import os
+import sys
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import benchmark  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+import update  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+
+
+class ForbiddenRepositoryHandler(benchmark.FakeGitHubHandler):
+    """Serve tags like the fake API, but refuse repositories named 'forbidden' like an organization enforcing SAML."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve a page of the tags endpoint, or a 403 that is not a rate limit."""
+        if "/forbidden/" in self.path:
+            self.server.count_request()
+            self.send_json(403, {"message": "Resource protected by organization SAML enforcement."})
+            return
+        super().do_GET()
+
+
+class UnavailableHandler(BaseHTTPRequestHandler):
+    """Answer every request like a cache server whose upstream lookups keep failing."""
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        """Silence the default per-request logging."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Answer with 503."""
+        payload: bytes = json.dumps({"message": "The action could not be looked up, try again later."}).encode()
+        self.send_response(503)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start(server: ThreadingHTTPServer) -> str:
+    """
+    Serve requests in the background.
+
+    Arguments:
+        server (ThreadingHTTPServer): The server to run.
+
+    Returns:
+        str: The base URL of the server.
+    """
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class CacheServerTest(unittest.TestCase):
+    """Check that the cache server keeps serving after failures that go away."""
+
+    def setUp(self) -> None:
+        """Start the fake API and a cache server in front of it."""
+        benchmark.reset_update_state()
+        update.set_retry_policy(0, 0.0, 5.0)
+
+        self.api: benchmark.FakeGitHubServer = benchmark.FakeGitHubServer(10, 0.0, None)
+        self.api.RequestHandlerClass = ForbiddenRepositoryHandler
+        update.set_api_url(start(self.api))
+        self.addCleanup(update.set_api_url, "https://api.github.com")
+        self.addCleanup(self.api.server_close)
+        self.addCleanup(self.api.shutdown)
+
+        self.session = update.create_http_session()
+        self.addCleanup(self.session.close)
+        self.server: update.CacheServer = update.CacheServer(("127.0.0.1", 0), None, False, self.session)
+        self.url: str = start(self.server)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def get(self, owner: str, repo: str) -> Tuple[int, Any]:
+        """
+        Look an action up through the cache server.
+
+        Arguments:
+            owner (str): The owner of the action.
+            repo (str): The name of the action.
+
+        Returns:
+            Tuple[int, Any]: The status code and decoded body of the response.
+        """
+        try:
+            with urllib.request.urlopen(f"{self.url}/v1/actions/{owner}/{repo}") as response:  # nosec B310
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def test_forbidden_action_does_not_block_others(self) -> None:
+        """A 403 that is not a rate limit only fails the action it was for."""
+        self.assertEqual(self.get("o", "forbidden")[0], 503)
+        status, body = self.get("o", "r")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["tag"], "v0.1.4")
+
+    def test_dot_segments_are_rejected(self) -> None:
+        """Owner and repository names cannot walk up the upstream URL."""
+        self.assertEqual(self.get("..", "r")[0], 404)
+        self.assertEqual(self.api.request_count, 0)
+
+
+class CacheServerFallbackTest(unittest.TestCase):
+    """Check that runs look actions up directly when the cache server cannot."""
+
+    def test_unavailable_lookup_falls_back_to_the_api(self) -> None:
+        """An action the cache server answers with 503 is looked up through the API."""
+        benchmark.reset_update_state()
+        update.set_retry_policy(0, 0.0, 5.0)
+
+        api: benchmark.FakeGitHubServer = benchmark.FakeGitHubServer(10, 0.0, None)
+        update.set_api_url(start(api))
+        cache: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), UnavailableHandler)
+        update.set_cache_url(start(cache))
+        try:
+            self.assertEqual(update.get_latest_version("o", "r", None, False)[0], "v0.1.4")
+            self.assertEqual(api.request_count, 1)
+        finally:
+            update.set_cache_url(None)
+            update.set_api_url("https://api.github.com")
+            for server in (api, cache):
+                server.shutdown()
+                server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
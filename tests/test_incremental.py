@@ -0,0 +1,82 @@
+"""Tests for skipping files that did not change since the last incremental run."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import update  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+
+WORKFLOW: str = "jobs:\n  build:\n    steps:\n      - uses: actions/checkout@{sha} # v{version}\n"
+
+
+class IncrementalScanTest(unittest.TestCase):
+    """Check that the file index only lets changed files be scanned again."""
+
+    def setUp(self) -> None:
+        """Create workflow files and a persistent cache."""
+        self.root: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.paths: List[str] = [self.write(f"workflow{index}.yml", "a" * 40, "1.0.0") for index in range(3)]
+        update.open_persistent_cache(os.path.join(self.root, "cache.db"), update.DEFAULT_CACHE_TTL, update.DEFAULT_CACHE_MAX_ENTRIES, False)
+        self.addCleanup(update.close_persistent_cache)
+
+    def write(self, name: str, sha: str, version: str) -> str:
+        """
+        Write a workflow file referencing one action.
+
+        Arguments:
+            name (str): The file name.
+            sha (str): The pinned commit SHA.
+            version (str): The version in the comment.
+
+        Returns:
+            str: The path of the file.
+        """
+        path: str = os.path.join(self.root, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(WORKFLOW.format(sha=sha, version=version))
+        return path
+
+    def scan(self) -> Dict[str, Any]:
+        """
+        Collect the references of the workflow files, recording which files were scanned.
+
+        Returns:
+            Dict[str, Any]: The references of each file, and the files that were scanned under 'scanned'.
+        """
+        with mock.patch.object(update, "fingerprint_file", wraps=update.fingerprint_file) as fingerprint:
+            references: Dict[str, Any] = update.collect_indexed_references(self.paths)
+        return {"references": references, "scanned": sorted(call.args[0] for call in fingerprint.call_args_list)}
+
+    def test_unchanged_files_are_not_scanned(self) -> None:
+        """The second run serves every file from the index."""
+        first: Dict[str, Any] = self.scan()
+        self.assertEqual(first["scanned"], sorted(self.paths))
+
+        second: Dict[str, Any] = self.scan()
+        self.assertEqual(second["scanned"], [])
+        self.assertEqual(second["references"], first["references"])
+
+    def test_changed_file_is_scanned_again(self) -> None:
+        """Only a file whose size or modification time changed is scanned, and its new references are used."""
+        self.scan()
+        self.write("workflow1.yml", "b" * 40, "1.10.0")
+
+        second: Dict[str, Any] = self.scan()
+        self.assertEqual(second["scanned"], [self.paths[1]])
+        self.assertEqual(second["references"][self.paths[1]], [("actions", "checkout", "b" * 40, "1.10.0")])
+
+    def test_only_requested_files_are_loaded(self) -> None:
+        """Loading the index only reads the entries of the files being scanned."""
+        self.scan()
+        self.assertEqual(list(update.load_file_index([os.path.abspath(self.paths[0])])), [os.path.abspath(self.paths[0])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""Tests for resolving action versions from local bare git mirrors."""
+
+import os
+import shutil
+import subprocess  # nosec B404
+import sys
+import tempfile
+import unittest
+import zlib
+from typing import Optional
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import update  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+
+COMMIT_SHA: str = "a" * 40
+OTHER_COMMIT_SHA: str = "b" * 40
+TAG_SHA: str = "c" * 40
+
+
+class ReadMirrorTagsTest(unittest.TestCase):
+    """Check that mirror tags resolve to commits and never to tag objects."""
+
+    def setUp(self) -> None:
+        """Create an empty bare mirror layout."""
+        self.mirror: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.mirror)
+        os.makedirs(os.path.join(self.mirror, "refs", "tags"))
+
+    def write_packed_refs(self, *lines: str, peeled: bool = True) -> None:
+        """
+        Write the packed-refs file of the mirror.
+
+        Arguments:
+            lines (str): The ref lines.
+            peeled (bool): Whether the file has the 'peeled' trait.
+        """
+        header: str = "# pack-refs with: peeled fully-peeled sorted \n" if peeled else "# pack-refs with: sorted \n"
+        with open(os.path.join(self.mirror, "packed-refs"), 'w', encoding='utf-8') as file:
+            file.write(header + "".join(f"{line}\n" for line in lines))
+
+    def write_loose_ref(self, tag: str, sha: str) -> None:
+        """
+        Write a loose tag ref of the mirror.
+
+        Arguments:
+            tag (str): The tag name.
+            sha (str): The SHA the tag points to.
+        """
+        with open(os.path.join(self.mirror, "refs", "tags", tag), 'w', encoding='utf-8') as file:
+            file.write(f"{sha}\n")
+
+    def write_loose_object(self, sha: str, kind: str, body: bytes) -> None:
+        """
+        Write a loose object of the mirror.
+
+        Arguments:
+            sha (str): The SHA to store the object under.
+            kind (str): The object type.
+            body (bytes): The object content.
+        """
+        os.makedirs(os.path.join(self.mirror, "objects", sha[:2]), exist_ok=True)
+        with open(os.path.join(self.mirror, "objects", sha[:2], sha[2:]), 'wb') as file:
+            file.write(zlib.compress(f"{kind} {len(body)}\0".encode('ascii') + body))
+
+    def read_tags(self, git: Optional[str] = None) -> dict:
+        """
+        Read the mirror's tags with git unavailable.
+
+        Arguments:
+            git (Optional[str]): The git executable to report.
+
+        Returns:
+            dict: The commit SHA of each tag.
+        """
+        with mock.patch.object(update.shutil, "which", return_value=git):
+            return dict(update.read_mirror_tags(self.mirror))
+
+    def test_peeled_packed_refs(self) -> None:
+        """Peeled packed refs resolve annotated tags to their peeled commit and lightweight tags to their SHA."""
+        self.write_packed_refs(f"{TAG_SHA} refs/tags/v2.0.0", f"^{COMMIT_SHA}", f"{OTHER_COMMIT_SHA} refs/tags/v1.0.0")
+        self.assertEqual(self.read_tags(), {"v2.0.0": COMMIT_SHA, "v1.0.0": OTHER_COMMIT_SHA})
+
+    def test_unpeeled_packed_refs_without_git(self) -> None:
+        """Tags in packed refs without the peeled trait are left out when their packed objects cannot be peeled."""
+        self.write_packed_refs(f"{TAG_SHA} refs/tags/v2.0.0", f"{OTHER_COMMIT_SHA} refs/tags/v1.0.0", peeled=False)
+        self.assertEqual(self.read_tags(), {})
+
+    def test_unpeeled_packed_refs_with_loose_objects(self) -> None:
+        """Tags in packed refs without the peeled trait are peeled from their loose objects."""
+        self.write_packed_refs(f"{TAG_SHA} refs/tags/v2.0.0", peeled=False)
+        self.write_loose_object(TAG_SHA, "tag", f"object {COMMIT_SHA}\ntype commit\ntag v2.0.0\n".encode('ascii'))
+        self.write_loose_object(COMMIT_SHA, "commit", b"tree " + b"d" * 40 + b"\n")
+        self.assertEqual(self.read_tags(), {"v2.0.0": COMMIT_SHA})
+
+    def test_loose_ref_overrides_packed_ref(self) -> None:
+        """A loose ref takes precedence over the peeled packed ref of the same tag."""
+        self.write_packed_refs(f"{OTHER_COMMIT_SHA} refs/tags/v2.0.0")
+        self.write_loose_ref("v2.0.0", TAG_SHA)
+        self.write_loose_object(TAG_SHA, "tag", f"object {COMMIT_SHA}\ntype commit\ntag v2.0.0\n".encode('ascii'))
+        self.write_loose_object(COMMIT_SHA, "commit", b"tree " + b"d" * 40 + b"\n")
+        self.assertEqual(self.read_tags(), {"v2.0.0": COMMIT_SHA})
+
+    def test_loose_ref_to_packed_object_without_git(self) -> None:
+        """A loose ref whose object is packed is left out when git is not available."""
+        self.write_packed_refs(f"{OTHER_COMMIT_SHA} refs/tags/v2.0.0")
+        self.write_loose_ref("v2.0.0", TAG_SHA)
+        self.assertEqual(self.read_tags(), {})
+
+    def test_tag_of_a_tree(self) -> None:
+        """A tag that does not point to a commit is left out."""
+        self.write_loose_ref("v2.0.0", TAG_SHA)
+        self.write_loose_object(TAG_SHA, "tag", b"object " + b"d" * 40 + b"\ntype tree\ntag v2.0.0\n")
+        self.write_loose_object("d" * 40, "tree", b"")
+        self.assertEqual(self.read_tags(), {})
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class ReadGitMirrorTagsTest(unittest.TestCase):
+    """Check mirror tags against repositories created by git."""
+
+    def setUp(self) -> None:
+        """Create a bare mirror with a lightweight and an annotated tag."""
+        self.root: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.mirror: str = os.path.join(self.root, "mirror.git")
+        self.loose_mirror: str = os.path.join(self.root, "loose.git")
+        work: str = os.path.join(self.root, "work")
+
+        self.git("init", "-q", work)
+        self.git("-C", work, "-c", "user.name=Test", "-c", "user.email=test@example.com", "commit", "-q", "--allow-empty", "-m", "first")
+        self.git("-C", work, "tag", "v1.0.0")
+        self.git("-C", work, "-c", "user.name=Test", "-c", "user.email=test@example.com", "commit", "-q", "--allow-empty", "-m", "second")
+        self.git("-C", work, "-c", "user.name=Test", "-c", "user.email=test@example.com", "tag", "-a", "v2.0.0", "-m", "v2.0.0")
+        self.git("clone", "-q", "--mirror", "--no-local", work, self.mirror)
+        self.git("clone", "-q", "--mirror", work, self.loose_mirror)
+        self.expected: dict = {tag: self.git("-C", work, "rev-parse", f"{tag}^{{commit}}") for tag in ("v1.0.0", "v2.0.0")}
+
+    @staticmethod
+    def git(*args: str) -> str:
+        """
+        Run git.
+
+        Arguments:
+            args (str): The git arguments.
+
+        Returns:
+            str: The output of git.
+        """
+        return subprocess.run(["git", *args], capture_output=True, check=True, text=True).stdout.strip()  # nosec B603 B607
+
+    def test_packed_objects(self) -> None:
+        """Tags whose objects are packed are peeled by git."""
+        self.assertEqual(dict(update.read_mirror_tags(self.mirror)), self.expected)
+
+    def test_packed_objects_with_unpeeled_refs(self) -> None:
+        """Packed refs without the peeled trait are peeled by git, and a bad object does not affect the others."""
+        refs: str = "".join(f"{self.git('--git-dir', self.mirror, 'rev-parse', tag)} refs/tags/{tag}\n" for tag in self.expected)
+        with open(os.path.join(self.mirror, "packed-refs"), 'w', encoding='utf-8') as file:
+            file.write("# pack-refs with: sorted \n" + refs)
+            file.write(f"{'e' * 40} refs/tags/v3.0.0\n")
+        self.assertEqual(dict(update.read_mirror_tags(self.mirror)), self.expected)
+
+    def test_loose_objects(self) -> None:
+        """Tags whose objects are loose are peeled without git."""
+        with open(os.path.join(self.loose_mirror, "packed-refs"), 'r', encoding='utf-8') as file:
+            refs: str = file.read()
+        with open(os.path.join(self.loose_mirror, "packed-refs"), 'w', encoding='utf-8') as file:
+            file.write("".join(line for line in refs.splitlines(keepends=True) if not line.startswith(("#", "^"))))
+        with mock.patch.object(update.shutil, "which", return_value=None):
+            self.assertEqual(dict(update.read_mirror_tags(self.loose_mirror)), self.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
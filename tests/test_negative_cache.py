@@ -0,0 +1,71 @@
+"""Tests for remembering actions that could not be resolved."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Optional, Tuple
+
+from fake_api import FakeApiTestCase, benchmark, update
+
+MEMBER_TOKEN: str = "member-token"
+
+
+class PrivateRepositoryHandler(benchmark.FakeGitHubHandler):
+    """Serve tags like the fake API, but answer 404 for repositories named 'private' unless the request has the member token."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve a page of the tags endpoint, or a 404 for a private repository."""
+        if "/private/" in self.path and not self.headers.get("Authorization", "").endswith(MEMBER_TOKEN):
+            self.server.count_request()
+            self.send_json(404, {"message": "Not Found"})
+            return
+        super().do_GET()
+
+
+class NegativeCacheTest(FakeApiTestCase):
+    """Check that failures are remembered across runs only where they apply."""
+
+    handler = PrivateRepositoryHandler
+
+    def setUp(self) -> None:
+        """Create a scratch directory for the persistent cache."""
+        super().setUp()
+        self.cache_dir: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def run_lookup(self, repo: str, github_token: Optional[str]) -> Tuple[Optional[Tuple[str, str]], int]:
+        """
+        Look an action up in a new run sharing the persistent cache.
+
+        Arguments:
+            repo (str): The name of the action.
+            github_token (Optional[str]): The token of the run.
+
+        Returns:
+            Tuple[Optional[Tuple[str, str]], int]: The latest version, and the number of API requests the run sent.
+        """
+        benchmark.reset_update_state()
+        update.open_persistent_cache(os.path.join(self.cache_dir, "cache.db"), update.DEFAULT_CACHE_TTL, update.DEFAULT_CACHE_MAX_ENTRIES, False)
+        requests_before: int = self.server.request_count
+        try:
+            return update.get_latest_version("o", repo, github_token, False), self.server.request_count - requests_before
+        finally:
+            update.close_persistent_cache()
+
+    def test_not_found_is_remembered_for_the_same_credentials(self) -> None:
+        """A repository that was not found is not looked up again by a later run with the same credentials."""
+        self.assertEqual(self.run_lookup("private", None), (None, 1))
+        self.assertEqual(self.run_lookup("private", None), (None, 0))
+
+    def test_not_found_is_not_shared_with_other_credentials(self) -> None:
+        """A private repository that was not found without access is looked up again by a run that may see it."""
+        self.assertEqual(self.run_lookup("private", None), (None, 1))
+        self.assertEqual(self.run_lookup("private", "other-token"), (None, 1))
+        latest, requests_sent = self.run_lookup("private", MEMBER_TOKEN)
+        self.assertIsNotNone(latest)
+        self.assertEqual(requests_sent, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Tests for splitting a fleet into shards and merging the results of sharded runs."""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import update  # noqa: E402  # pylint: disable=import-error,wrong-import-position
+
+FOLDERS: List[str] = [f"repo-{index}" for index in range(40)]
+
+
+class SelectShardTest(unittest.TestCase):
+    """Check that shards split the folders between runners."""
+
+    def setUp(self) -> None:
+        """Create a scratch directory."""
+        self.root: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_shards_are_disjoint_and_complete(self) -> None:
+        """Every folder is in exactly one shard, whatever order the folders are listed in."""
+        shards: List[List[str]] = [update.select_shard(FOLDERS, index, 3) for index in range(1, 4)]
+        self.assertEqual(sorted(folder for shard in shards for folder in shard), sorted(FOLDERS))
+        self.assertEqual(update.select_shard(FOLDERS[::-1], 2, 3), shards[1][::-1])
+
+    def test_manifest_location_does_not_change_shards(self) -> None:
+        """Runners with their checkout at different locations select the same entries of the same manifest."""
+        selected: List[List[str]] = []
+        for checkout in ("first", "second/nested"):
+            manifest: str = os.path.join(self.root, checkout, "repos.txt")
+            os.makedirs(os.path.dirname(manifest))
+            with open(manifest, 'w', encoding='utf-8') as file:
+                file.write("".join(f"{folder}\n" for folder in FOLDERS))
+            selected.append([os.path.basename(path) for path in update.get_folder_paths(None, manifest, (1, 3), False)])
+        self.assertEqual(selected[0], selected[1])
+        self.assertTrue(selected[0])
+
+
+class MergeTest(unittest.TestCase):
+    """Check that merging counts the results of each shard once."""
+
+    def setUp(self) -> None:
+        """Create a scratch directory."""
+        self.root: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def write_shard(self, index: int, count: int) -> str:
+        """
+        Write the results file of one shard.
+
+        Arguments:
+            index (int): The shard index.
+            count (int): The number of shards.
+
+        Returns:
+            str: The path of the results file.
+        """
+        path: str = os.path.join(self.root, f"shard{index}-of-{count}.json")
+        update.write_results(path, {f"root{index}": {'total_files': 12, 'files_updated': 6, 'total_changes': 36}}, (index, count))
+        return path
+
+    def merge(self, *paths: str) -> Dict[str, Any]:
+        """
+        Merge results files.
+
+        Arguments:
+            paths (str): The results files.
+
+        Returns:
+            Dict[str, Any]: The merged results.
+        """
+        output: str = os.path.join(self.root, "merged.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            update.merge_main([*paths, "--output", output])
+        with open(output, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def test_shards_are_summed(self) -> None:
+        """The totals of different shards are added up."""
+        self.assertEqual(self.merge(self.write_shard(1, 2), self.write_shard(2, 2))["total"]["total_files"], 24)
+
+    def test_repeated_shard_is_counted_once(self) -> None:
+        """A results file given twice does not double the totals."""
+        path: str = self.write_shard(2, 2)
+        self.assertEqual(self.merge(path, path)["total"], {'total_files': 12, 'files_updated': 6, 'total_changes': 36})
+
+    def test_different_shard_counts_are_refused(self) -> None:
+        """Results of runs split into different numbers of shards cannot be merged."""
+        with self.assertRaises(SystemExit), contextlib.redirect_stdout(io.StringIO()):
+            update.merge_main([self.write_shard(1, 2), self.write_shard(2, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
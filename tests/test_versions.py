@@ -0,0 +1,69 @@
+"""Tests for picking the latest version of an action from the paginated tags API."""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from fake_api import FakeApiTestCase, benchmark, update
+
+TAG_COUNT: int = 300  # Three pages, with the highest version on the third
+LATEST_VERSION: str = "v11.4.4"
+
+
+class FailingPageHandler(benchmark.FakeGitHubHandler):
+    """Serve tags like the fake API, but fail the second page of repositories named 'broken'."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serve a page of the tags endpoint, or a server error for the second page of a broken repository."""
+        parsed = urlparse(self.path)
+        if parsed.path.endswith("/broken/tags") and parse_qs(parsed.query).get("page") == ["2"]:
+            self.server.count_request()
+            self.send_json(500, {"message": "Server Error"})
+            return
+        super().do_GET()
+
+
+class LatestVersionTest(FakeApiTestCase):
+    """Check that every page of tags is read before the latest version is picked."""
+
+    tag_count = TAG_COUNT
+    handler = FailingPageHandler
+
+    def setUp(self) -> None:
+        """Start with a fresh persistent cache."""
+        super().setUp()
+        cache_dir: str = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        update.open_persistent_cache(os.path.join(cache_dir, "cache.db"), update.DEFAULT_CACHE_TTL, update.DEFAULT_CACHE_MAX_ENTRIES, False)
+        self.addCleanup(update.close_persistent_cache)
+
+    def test_latest_version_across_pages(self) -> None:
+        """The highest version is picked even when it is not on the first page."""
+        self.assertEqual(update.get_latest_version("o", "r", None, False)[0], LATEST_VERSION)
+        self.assertEqual(update.load_persistent_version("o", "r")[0], LATEST_VERSION)
+
+    def test_failing_page_is_not_used_or_cached(self) -> None:
+        """An incomplete listing is treated like a failed request rather than cached as the latest version."""
+        self.assertIsNone(update.get_latest_version("o", "broken", None, False))
+        self.assertIsNone(update.load_persistent_version("o", "broken"))
+        self.assertIsNone(update.get_cached_failure("o", "broken"))
+
+        benchmark.reset_update_state()
+        requests_before: int = self.server.request_count
+        self.assertIsNone(update.get_latest_version("o", "broken", None, False))
+        self.assertGreater(self.server.request_count, requests_before)
+
+    @unittest.skipIf(update.aiohttp is None, "aiohttp is not installed")
+    def test_async_latest_version_across_pages(self) -> None:
+        """The asyncio engine picks the same version, and does not use an incomplete listing either."""
+        results = asyncio.run(update.async_resolve_actions([("o", "r"), ("o", "broken")], None, False))
+        self.assertEqual(results[("o", "r")][0], LATEST_VERSION)
+        self.assertIsNone(results[("o", "broken")])
+        self.assertIsNone(update.load_persistent_version("o", "broken"))
+
+
+if __name__ == "__main__":
+    unittest.main()